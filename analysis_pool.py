@@ -0,0 +1,141 @@
+import asyncio
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_worker_state = threading.local()
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when the analysis pool has no room for another job"""
+
+    def __init__(self, retry_after):
+        super().__init__("Analysis pool is saturated")
+        self.retry_after = retry_after
+
+
+def _resolve(factory):
+    """A factory given as 'module:attribute' is imported inside the worker, on first use"""
+    if isinstance(factory, str):
+        module, _, attribute = factory.partition(':')
+        return getattr(importlib.import_module(module), attribute)
+    return factory
+
+
+# Analyzers built by preload() in a parent process before it forks server processes.
+# Pool workers adopt these instead of building their own, so the parsed cascades stay
+# in copy-on-write pages shared by every process.
+_preloaded = []
+
+
+def preload(analyzer_factory, count):
+    """Build analyzers now, in this process, for up to `count` pool workers to adopt later"""
+    factory = _resolve(analyzer_factory)
+    _preloaded.extend(factory() for _ in range(count))
+
+
+def _init_worker(analyzer_factory):
+    """Give each worker its own analyzer so cascades are never shared across threads"""
+    try:
+        _worker_state.analyzer = _preloaded.pop()
+    except IndexError:
+        _worker_state.analyzer = _resolve(analyzer_factory)()
+
+
+def _warm_job(hold):
+    """No-op that keeps its worker busy briefly so each warm-up job starts a new worker"""
+    time.sleep(hold)
+
+
+def _run_job(method, args, submitted_at):
+    """Execute an analyzer method inside a worker and report how long it queued and each stage took"""
+    waited = time.monotonic() - submitted_at
+    analyzer = _worker_state.analyzer
+    analyzer.timings = {}
+    result = getattr(analyzer, method)(*args)
+    return result, waited, analyzer.timings
+
+
+class AnalysisPool:
+    """Bounded executor that keeps CPU-bound image analysis off the event loop"""
+
+    def __init__(self, analyzer_factory, kind=None, workers=None, max_queue=None, retry_after=None, observer=None):
+        self.analyzer_factory = analyzer_factory
+        self.kind = kind or os.getenv('ANALYZER_POOL_KIND', 'thread')
+        self.workers = int(workers or os.getenv('ANALYZER_WORKERS') or os.cpu_count() or 1)
+        self.max_queue = int(max_queue if max_queue is not None else os.getenv('ANALYZER_QUEUE_SIZE', self.workers * 4))
+        self.retry_after = int(retry_after or os.getenv('ANALYZER_RETRY_AFTER', 2))
+        # Called as observer(method, waited, timings) after each job, e.g. to feed metrics
+        self.observer = observer
+
+        if self.kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown analyzer pool kind: {self.kind}")
+        executor_cls = ProcessPoolExecutor if self.kind == 'process' else ThreadPoolExecutor
+        self.executor = executor_cls(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(analyzer_factory,)
+        )
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def submit(self, method, *args):
+        """Run analyzer.<method>(*args) in the pool, rejecting work when it is full"""
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise PoolSaturated(self.retry_after)
+            self._pending += 1
+
+        try:
+            future = self.executor.submit(_run_job, method, args, time.monotonic())
+        except BaseException:
+            self._release()
+            raise
+        # Released when the job itself ends: a cancelled caller leaves it queued or running
+        future.add_done_callback(self._release)
+        result, waited, timings = await asyncio.wrap_future(future)
+
+        with self._lock:
+            self._completed += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        if self.observer is not None:
+            self.observer(method, waited, timings)
+
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    async def warm_up(self, hold=0.05):
+        """Start every worker now, so each has built its analyzer before the first upload"""
+        futures = [self.executor.submit(_warm_job, hold) for _ in range(self.workers)]
+        await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+
+    def stats(self):
+        """Snapshot of queue depth and wait-time metrics"""
+        with self._lock:
+            queued = max(0, self._pending - self.workers)
+            return {
+                'kind': self.kind,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self._pending,
+                'queue_depth': queued,
+                'completed': self._completed,
+                'rejected': self._rejected,
+                'avg_wait_ms': (self._wait_total / self._completed * 1000) if self._completed else 0.0,
+                'max_wait_ms': self._wait_max * 1000
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
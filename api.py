@@ -1,38 +1,83 @@
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 
-import shutil
+import asyncio
 import os
-from pathlib import Path
-
-try:
-    from image_analyzer import ImageAnalyzer
-except ImportError:
-    class ImageAnalyzer:
-        def analyze_photo(self, path):
-            return {'faces': {'count': 1}, 'objects': {}, 'colors': {'theme': 'mixed'}, 'composition': {'resolution': 'medium'}}
-
-try:
-    from roast_generator import RoastGenerator
-except ImportError:
-    class RoastGenerator:
-        def generate_roast(self, features, style):
-            return "I'd roast you, but I'm having technical difficulties. At least that's more functional than this photo!"
-        def generate_comeback(self, message):
-            return "That's what they all say!"
-        def create_standup_routine(self, features):
-            return ["I'd tell you a joke, but my comedy module is broken!", "Just like this photo!"]
-        def chat_response(self, message, context):
-            responses = [
-                "Oh, you want to chat? How adorable! 😏",
-                "I'm here to roast, not to be your therapist! 🔥",
-                "That's... actually not terrible. Are you feeling okay? 🤔",
-                "I've heard funnier things from a broken calculator! 😂"
-            ]
-            return responses[len(message) % len(responses)]
-
-app = FastAPI(title="AI Roast Master", version="1.0.0")
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from analysis_pool import AnalysisPool, PoolSaturated
+from chat_sessions import ChatSessions
+from clip_analyzer import ClipAnalyzer
+from image_guard import ImageGuard, ImageRejected
+from intent_matcher import IntentMatcher
+from json_response import FastJSONResponse, dumps
+from metrics import ENDPOINT_ERRORS, REGISTRY, STAGE_SECONDS, GaugeCallback
+from near_duplicates import NearDuplicateIndex, same_photo
+from photo_features import as_features
+from result_cache import ResultCache, content_key
+from roast_generator import RoastGenerator
+from roast_pool import RoastPool
+from static_pages import StaticPages
+
+FALLBACK_ROAST = "I'd roast you, but I'm having technical difficulties. At least that's more functional than this photo!"
+
+# Uploads bigger than this are hashed in a thread; blake2b takes ~3 ms per MB
+HASH_IN_THREAD_BYTES = 1024 * 1024
+
+# Pre-load the LLM client and every analyzer worker's cascades in the background after startup
+WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', '').lower() in ('1', 'true', 'yes')
+
+# Results keyed by image content hash (and style, for roasts)
+feature_cache = ResultCache('features')
+roast_cache = ResultCache('roasts')
+near_duplicates = NearDuplicateIndex()
+image_guard = ImageGuard()
+
+# Cheap to build: the OpenAI SDK is only imported on the first LLM call
+roast_gen = RoastGenerator(cache=roast_cache)
+# Roasts for common kinds of photo, generated ahead of demand off the request path
+roast_pool = RoastPool(roast_gen)
+
+intent_matcher = IntentMatcher.from_file()
+chat_sessions = ChatSessions()
+
+def _observe_analysis(method, waited, timings):
+    """Feed queue wait and per-stage analyzer timings into the stage histogram"""
+    STAGE_SECONDS.labels('pool_wait').observe(waited)
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+# Each pool worker imports OpenCV and builds its own ImageAnalyzer when it starts
+analysis_pool = AnalysisPool('image_analyzer:ImageAnalyzer', observer=_observe_analysis)
+# GIFs and short videos: sampled frames fan out over the same pool
+clip_analyzer = ClipAnalyzer(analysis_pool)
+
+async def _warm_up():
+    try:
+        await asyncio.gather(analysis_pool.warm_up(), asyncio.to_thread(roast_gen.warm_up))
+    except Exception as e:
+        print(f"Warning: Warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately; warm-up only shortens the first requests
+    warm_up = asyncio.create_task(_warm_up()) if WARMUP_ON_STARTUP else None
+    roast_pool.start()
+    yield
+    if warm_up is not None:
+        warm_up.cancel()
+    await roast_pool.stop()
+    analysis_pool.shutdown(wait=False)
+    clip_analyzer.shutdown()
+    await roast_gen.aclose()
+    for cache in (feature_cache, roast_cache):
+        await asyncio.to_thread(cache.close)
+
+# Handlers return FastJSONResponse themselves so FastAPI's generic encoder never walks the payload
+app = FastAPI(title="AI Roast Master", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -42,332 +87,250 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-try:
-    analyzer = ImageAnalyzer()
-    roast_gen = RoastGenerator()
-except Exception as e:
-    print(f"Warning: Could not initialize components: {e}")
-    analyzer = ImageAnalyzer()
-    roast_gen = RoastGenerator()
+# Component stats are read at scrape time, so they cost nothing between scrapes
+def _pool_gauges():
+    stats = analysis_pool.stats()
+    return [((key,), stats[key]) for key in ('workers', 'in_flight', 'queue_depth', 'completed', 'rejected')]
+
+def _cache_gauges():
+    samples = []
+    for name, cache in (('features', feature_cache), ('roasts', roast_cache)):
+        stats = cache.stats()
+        samples.extend(((name, key), stats[key]) for key in ('entries', 'bytes', 'hits', 'disk_hits', 'misses', 'evictions',
+                                                                 'disk_errors', 'dropped_writes', 'pending_writes'))
+    return samples
+
+def _near_duplicate_gauges():
+    return [((key,), value) for key, value in near_duplicates.stats().items()]
+
+def _chat_session_gauges():
+    return [((key,), value) for key, value in chat_sessions.stats().items()]
+
+def _coalescing_gauges():
+    return [((key,), value) for key, value in roast_gen.flights.stats().items()]
+
+def _roast_pool_gauges():
+    return [((key,), value) for key, value in roast_pool.stats().items()]
+
+GaugeCallback('roast_analyzer_pool', 'Analyzer pool workers, occupancy and job counts.', _pool_gauges, ('stat',))
+GaugeCallback('roast_result_cache', 'Result cache sizes and hit counts.', _cache_gauges, ('cache', 'stat'))
+GaugeCallback('roast_near_duplicates', 'Near-duplicate index size and hit counts.', _near_duplicate_gauges, ('stat',))
+GaugeCallback('roast_chat_sessions', 'Chat sessions held, their text bytes, and sessions expired or evicted.', _chat_session_gauges, ('stat',))
+GaugeCallback('roast_llm_coalescing', 'Upstream LLM calls made, shared by identical requests, or reused within the TTL.', _coalescing_gauges, ('stat',))
+GaugeCallback('roast_pregenerated', 'Pre-generated roast pool: buckets tracked, roasts ready, hits, misses and refills.', _roast_pool_gauges, ('stat',))
 
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Pages are read and compressed once; requests only pick a variant or answer 304
+static_pages = StaticPages({
+    "/": "index.html",
+    "/home": "home.html",
+    "/about": "about.html",
+    "/gallery": "gallery.html",
+    "/contact": "contact.html",
+})
 
 @app.get("/", response_class=HTMLResponse)
-async def home():
-    return """<!DOCTYPE html>
-<html>
-<head>
-    <title>AI Roast Master</title>
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
-        body { 
-            font-family: 'Segoe UI', sans-serif; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh; color: white; overflow-x: hidden;
-        }
-        .container { max-width: 900px; margin: 0 auto; padding: 15px; text-align: center; }
-        .header { margin-bottom: 30px; }
-        .header h1 { font-size: clamp(2rem, 8vw, 3.5rem); margin-bottom: 10px; text-shadow: 2px 2px 4px rgba(0,0,0,0.3); }
-        .header p { font-size: clamp(1rem, 3vw, 1.2rem); opacity: 0.9; }
-        .main-card { background: rgba(255,255,255,0.1); backdrop-filter: blur(10px); border-radius: 20px; padding: clamp(20px, 5vw, 40px); margin: 15px 0; border: 1px solid rgba(255,255,255,0.2); box-shadow: 0 8px 32px rgba(0,0,0,0.1); }
-        .upload-zone { border: 3px dashed rgba(255,255,255,0.3); border-radius: 15px; padding: clamp(30px, 8vw, 60px) 20px; margin: 20px 0; transition: all 0.3s ease; cursor: pointer; touch-action: manipulation; }
-        .upload-zone:hover { border-color: rgba(255,255,255,0.6); background: rgba(255,255,255,0.05); }
-        .file-input { display: none; }
-        .upload-text { font-size: 1.3rem; margin-bottom: 15px; }
-        .upload-subtext { opacity: 0.7; font-size: 0.9rem; }
-        .style-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(150px, 1fr)); gap: 12px; margin: 25px 0; }
-        .style-btn { padding: clamp(12px, 3vw, 15px) clamp(15px, 4vw, 25px); border: none; border-radius: 12px; font-size: clamp(0.85rem, 2.5vw, 1rem); font-weight: 600; cursor: pointer; transition: all 0.3s ease; opacity: 0.7; transform: scale(0.95); touch-action: manipulation; min-height: 48px; }
-        .style-btn.active { opacity: 1; transform: scale(1); box-shadow: 0 5px 15px rgba(0,0,0,0.2); }
-        .savage { background: linear-gradient(45deg, #ff4757, #ff3742); color: white; }
-        .playful { background: linear-gradient(45deg, #2ed573, #17c0eb); color: white; }
-        .sarcastic { background: linear-gradient(45deg, #ffa502, #ff6348); color: white; }
-        .absurd { background: linear-gradient(45deg, #3742fa, #2f3542); color: white; }
-        .roast-btn { background: linear-gradient(45deg, #ff6b6b, #ee5a52); color: white; border: none; padding: clamp(15px, 4vw, 18px) clamp(25px, 6vw, 40px); font-size: clamp(1rem, 3vw, 1.2rem); font-weight: 700; border-radius: 50px; cursor: pointer; transition: all 0.3s ease; margin: 20px 0; box-shadow: 0 5px 15px rgba(255,107,107,0.4); touch-action: manipulation; min-height: 48px; width: 100%; max-width: 300px; }
-        .roast-btn:hover { transform: translateY(-2px); box-shadow: 0 8px 25px rgba(255,107,107,0.6); }
-        .roast-btn:disabled { opacity: 0.6; cursor: not-allowed; transform: none; }
-        .result-card { background: rgba(255,255,255,0.15); border-radius: 15px; padding: clamp(20px, 5vw, 30px); margin: 25px 0; border-left: 5px solid #ff6b6b; text-align: left; display: none; }
-        .result-card h3 { color: #ff6b6b; margin-bottom: 15px; font-size: clamp(1.2rem, 3.5vw, 1.4rem); }
-        .roast-text { font-size: clamp(1rem, 2.8vw, 1.1rem); line-height: 1.6; margin-bottom: 20px; font-style: italic; }
-        .chat-area { background: rgba(255,255,255,0.1); border-radius: 15px; padding: clamp(20px, 5vw, 30px); margin: 25px 0; }
-        .chat-input { width: 100%; padding: clamp(12px, 3vw, 15px); border: none; border-radius: 25px; font-size: clamp(0.9rem, 2.5vw, 1rem); background: rgba(255,255,255,0.2); color: white; margin-bottom: 15px; min-height: 48px; }
-        .chat-input::placeholder { color: rgba(255,255,255,0.7); }
-        .chat-messages { max-height: 300px; overflow-y: auto; margin-bottom: 15px; padding: 10px; background: rgba(255,255,255,0.05); border-radius: 15px; }
-        .chat-message { margin: 10px 0; padding: 10px 15px; border-radius: 20px; max-width: 80%; animation: fadeIn 0.3s ease; }
-        .user-message { background: linear-gradient(45deg, #667eea, #764ba2); margin-left: auto; text-align: right; }
-        .ai-message { background: linear-gradient(45deg, #ff6b6b, #ee5a52); margin-right: auto; }
-        .chat-input-container { display: flex; gap: 10px; margin-bottom: 15px; }
-        .chat-send-btn { background: linear-gradient(45deg, #ff6b6b, #ee5a52); color: white; border: none; padding: 12px 20px; border-radius: 25px; cursor: pointer; font-weight: 600; transition: all 0.3s; }
-        .chat-send-btn:hover { transform: translateY(-2px); }
-        .chat-suggestions { display: flex; gap: 8px; flex-wrap: wrap; margin-bottom: 15px; }
-        .suggestion-btn { background: rgba(255,255,255,0.1); color: white; border: none; padding: 8px 15px; border-radius: 20px; cursor: pointer; font-size: 0.9rem; transition: all 0.3s; }
-        .suggestion-btn:hover { background: rgba(255,255,255,0.2); transform: translateY(-2px); }
-        .loading { display: none; margin: 20px 0; }
-        .spinner { border: 3px solid rgba(255,255,255,0.3); border-top: 3px solid #ff6b6b; border-radius: 50%; width: 40px; height: 40px; animation: spin 1s linear infinite; margin: 0 auto; }
-        @keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
-        @keyframes fadeIn { from { opacity: 0; transform: translateY(10px); } to { opacity: 1; transform: translateY(0); } }
-        .footer { margin-top: 40px; opacity: 0.7; font-size: clamp(0.8rem, 2vw, 0.9rem); padding: 0 10px; }
-        .nav { text-align: center; margin-bottom: 30px; }
-        .nav a { color: white; text-decoration: none; margin: 0 15px; padding: 10px 20px; border-radius: 25px; background: rgba(255,255,255,0.1); transition: all 0.3s; }
-        .nav a:hover { background: rgba(255,255,255,0.2); }
-        @media (max-width: 768px) { .container { padding: 10px; } .style-grid { grid-template-columns: 1fr 1fr; gap: 10px; } }
-        @media (max-width: 480px) { .style-grid { grid-template-columns: 1fr; } }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <nav class="nav">
-            <a href="/">🏠 Home</a>
-            <a href="/about">ℹ️ About</a>
-            <a href="/gallery">🖼️ Gallery</a>
-            <a href="/contact">📞 Contact</a>
-        </nav>
-        
-        <div class="header">
-            <h1>🔥 AI Roast Master</h1>
-            <p>Upload your photo and prepare to get roasted by AI!</p>
-        </div>
-        
-        <div class="main-card">
-            <div class="upload-zone" onclick="document.getElementById('photoInput').click()">
-                <div class="upload-text">📸 Click to upload your photo</div>
-                <div class="upload-subtext">or drag and drop an image here</div>
-                <input type="file" id="photoInput" class="file-input" accept="image/*">
-            </div>
-            
-            <div class="style-grid">
-                <button class="style-btn savage" onclick="setStyle('savage')">🔥 Savage Mode</button>
-                <button class="style-btn playful active" onclick="setStyle('playful')">😄 Playful Roast</button>
-                <button class="style-btn sarcastic" onclick="setStyle('sarcastic')">😏 Sarcastic Wit</button>
-                <button class="style-btn absurd" onclick="setStyle('absurd')">🤪 Absurd Humor</button>
-            </div>
-            
-            <button class="roast-btn" id="roastBtn" onclick="uploadAndRoast()" disabled>🔥 ROAST ME NOW!</button>
-            
-            <div class="loading" id="loading">
-                <div class="spinner"></div>
-                <p>AI is analyzing your photo...</p>
-            </div>
-        </div>
-        
-        <div id="roastResult" class="result-card">
-            <h3>🔥 Your Roast:</h3>
-            <div class="roast-text" id="roastText"></div>
-            <button class="roast-btn" onclick="generateStandup()" style="font-size: 1rem; padding: 12px 25px;">🎭 Create Comedy Routine</button>
-        </div>
-        
-        <div class="chat-area">
-            <h3 style="margin-bottom: 20px;">💬 Chat with AI Roast Master</h3>
-            <div id="chatMessages" class="chat-messages"></div>
-            <div class="chat-suggestions">
-                <button class="suggestion-btn" onclick="sendSuggestion('Tell me a joke')">Tell me a joke</button>
-                <button class="suggestion-btn" onclick="sendSuggestion('Roast my style')">Roast my style</button>
-                <button class="suggestion-btn" onclick="sendSuggestion('You are funny')">You are funny</button>
-                <button class="suggestion-btn" onclick="sendSuggestion('Why so mean?')">Why so mean?</button>
-            </div>
-            <div class="chat-input-container">
-                <input type="text" id="chatInput" class="chat-input" placeholder="Say something to the AI... I dare you! 😏">
-                <button class="chat-send-btn" onclick="sendChatMessage()">🔥 Send</button>
-            </div>
-        </div>
-        
-        <div class="chat-area">
-            <h3 style="margin-bottom: 20px;">💬 Quick Comeback</h3>
-            <input type="text" id="comebackInput" class="chat-input" placeholder="Say something for a quick comeback...">
-            <button class="roast-btn" onclick="generateComeback()" style="font-size: 1rem; padding: 12px 25px;">Get Comeback</button>
-            <div id="comebackResult" style="margin-top: 15px; padding: 15px; background: rgba(255,255,255,0.1); border-radius: 10px; display: none;"></div>
-        </div>
-        
-        <div id="standupResult" class="result-card">
-            <h3>🎭 Your Comedy Routine:</h3>
-            <div id="standupText"></div>
-        </div>
-        
-        <div class="footer">
-            <p>Made with ❤️ and a lot of sass • AI-powered roasting at its finest</p>
-        </div>
-    </div>
-
-    <script>
-        let currentStyle = 'playful';
-        let currentFeatures = null;
-        let chatContext = [];
-
-        document.getElementById('photoInput').addEventListener('change', function(e) {
-            const file = e.target.files[0];
-            if (file) {
-                document.querySelector('.upload-text').textContent = `📸 ${file.name}`;
-                document.querySelector('.upload-subtext').textContent = 'Ready to roast!';
-                document.getElementById('roastBtn').disabled = false;
-            }
-        });
-
-        function setStyle(style) {
-            currentStyle = style;
-            document.querySelectorAll('.style-btn').forEach(btn => btn.classList.remove('active'));
-            document.querySelector('.' + style).classList.add('active');
-        }
-
-        async function uploadAndRoast() {
-            const fileInput = document.getElementById('photoInput');
-            if (!fileInput.files[0]) {
-                alert('Please select a photo first!');
-                return;
-            }
-
-            document.getElementById('loading').style.display = 'block';
-            document.getElementById('roastBtn').disabled = true;
-
-            const formData = new FormData();
-            formData.append('file', fileInput.files[0]);
-            formData.append('style', currentStyle);
-
-            try {
-                const response = await fetch('/roast', { method: 'POST', body: formData });
-                const result = await response.json();
-                currentFeatures = result.features;
-                
-                document.getElementById('roastText').textContent = result.roast;
-                document.getElementById('roastResult').style.display = 'block';
-            } catch (error) {
-                alert('Error: ' + error.message);
-            } finally {
-                document.getElementById('loading').style.display = 'none';
-                document.getElementById('roastBtn').disabled = false;
-            }
-        }
-
-        function addChatMessage(message, isUser = false) {
-            const chatMessages = document.getElementById('chatMessages');
-            const messageDiv = document.createElement('div');
-            messageDiv.className = `chat-message ${isUser ? 'user-message' : 'ai-message'}`;
-            messageDiv.textContent = message;
-            chatMessages.appendChild(messageDiv);
-            chatMessages.scrollTop = chatMessages.scrollHeight;
-        }
-        
-        async function sendChatMessage() {
-            const input = document.getElementById('chatInput');
-            const message = input.value.trim();
-            if (!message) return;
-            
-            addChatMessage(message, true);
-            input.value = '';
-            
-            try {
-                const response = await fetch('/chat', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: message, context: chatContext })
-                });
-                
-                const result = await response.json();
-                addChatMessage(result.response);
-                
-                chatContext.push({ user: message, ai: result.response });
-                if (chatContext.length > 5) chatContext.shift();
-            } catch (error) {
-                addChatMessage('My roasting circuits are overloaded! Try again! 🤖');
-            }
-        }
-        
-        function sendSuggestion(text) {
-            document.getElementById('chatInput').value = text;
-            sendChatMessage();
-        }
-
-        async function generateComeback() {
-            const input = document.getElementById('comebackInput').value;
-            if (!input.trim()) return;
-
-            const resultDiv = document.getElementById('comebackResult');
-            resultDiv.style.display = 'block';
-            resultDiv.innerHTML = 'Thinking...';
-
-            try {
-                const response = await fetch('/comeback', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: input })
-                });
-                
-                const result = await response.json();
-                resultDiv.innerHTML = `<div><strong>You:</strong> ${input}</div><div><strong>AI:</strong> ${result.comeback}</div>`;
-                document.getElementById('comebackInput').value = '';
-            } catch (error) {
-                resultDiv.innerHTML = 'Error: ' + error.message;
-            }
-        }
-
-        async function generateStandup() {
-            if (!currentFeatures) return;
-
-            try {
-                const response = await fetch('/standup', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ features: currentFeatures })
-                });
-                
-                const result = await response.json();
-                const standupHtml = result.routine.map((joke, i) => `<p><strong>${i + 1}.</strong> ${joke}</p>`).join('');
-                
-                document.getElementById('standupText').innerHTML = standupHtml;
-                document.getElementById('standupResult').style.display = 'block';
-            } catch (error) {
-                alert('Error: ' + error.message);
-            }
-        }
-
-        document.getElementById('comebackInput').addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') generateComeback();
-        });
-        
-        document.getElementById('chatInput').addEventListener('keypress', function(e) {
-            if (e.key === 'Enter') sendChatMessage();
-        });
+async def home(request: Request):
+    return static_pages.response("/", request)
+
+@app.get("/home", response_class=HTMLResponse)
+async def home_page(request: Request):
+    return static_pages.response("/home", request)
+
+@app.get("/about", response_class=HTMLResponse)
+async def about(request: Request):
+    return static_pages.response("/about", request)
 
-        // Add welcome message
-        setTimeout(() => {
-            addChatMessage('Hey there! Ready to get roasted? I\\'m your AI comedy master! 🔥😄');
-        }, 1000);
+@app.get("/gallery", response_class=HTMLResponse)
+async def gallery(request: Request):
+    return static_pages.response("/gallery", request)
 
-        setStyle('playful');
-    </script>
-</body>
-</html>"""
+@app.get("/contact", response_class=HTMLResponse)
+async def contact(request: Request):
+    return static_pages.response("/contact", request)
+
+def _busy(e: PoolSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Roast Master is busy, try again shortly",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+async def _analyze_upload(file: UploadFile):
+    """Validate an upload and return its content key, features and, for GIFs and videos, a clip summary"""
+    if not file.content_type or not file.content_type.startswith(("image/", "video/")):
+        raise HTTPException(status_code=400, detail="File must be an image or video")
+    
+    # Decode straight from the request body; nothing touches the disk.
+    # Reading one byte past the limit is enough to know the upload is too big.
+    started = time.perf_counter()
+    data = await file.read(image_guard.max_bytes + 1)
+    read_at = time.perf_counter()
+    STAGE_SECONDS.labels('upload').observe(read_at - started)
+    try:
+        header = image_guard.check(data)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    finally:
+        STAGE_SECONDS.labels('sniff').observe(time.perf_counter() - read_at)
+    # hashlib releases the GIL, so a big upload is hashed without stalling the event loop
+    image_key = await asyncio.to_thread(content_key, data) if len(data) > HASH_IN_THREAD_BYTES else content_key(data)
+    if header.animated:
+        features, clip = await _analyze_clip(image_key, data, header)
+        return image_key, features, clip
+    
+    # A repeat upload skips decoding and analysis entirely. A near-duplicate's entry is
+    # (original key, features), so it keeps sharing the original's roasts; entries
+    # persisted by older versions are plain dicts.
+    cached = await feature_cache.get_async(image_key)
+    if cached is not None:
+        key, features = cached if isinstance(cached, tuple) else (image_key, cached)
+        return key, as_features(features), None
+    
+    try:
+        features, fingerprint = await analysis_pool.submit('analyze_bytes', data, header, True)
+    except PoolSaturated as e:
+        raise _busy(e)
+    
+    # A recompressed or resized copy of a known photo reuses its features and roasts;
+    # the hash only sees texture, so the match is confirmed on colour and shape
+    original_key = near_duplicates.find(fingerprint)
+    if original_key is not None:
+        original = await feature_cache.get_async(original_key)
+        if original is not None and same_photo(features, original):
+            feature_cache.put(image_key, (original_key, original))
+            return original_key, as_features(original), None
+    
+    feature_cache.put(image_key, features)
+    near_duplicates.add(fingerprint, image_key)
+    return image_key, features, None
+
+async def _analyze_clip(image_key: str, data: bytes, header):
+    """Sampled-frame analysis of an animated image or video; partial results are not cached"""
+    cached = await feature_cache.get_async(f"clip:{image_key}")
+    if cached is not None:
+        return cached
+    
+    try:
+        features, clip = await clip_analyzer.analyze(data, header)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except PoolSaturated as e:
+        raise _busy(e)
+    
+    if not clip['partial']:
+        feature_cache.put(f"clip:{image_key}", (features, clip))
+    return features, clip
+
+def _roast_key(image_key: str, style: str, clip) -> Optional[str]:
+    """Roast cache key for an upload; roasts of partly analysed clips are not kept under it"""
+    return None if clip and clip['partial'] else f"{image_key}:{style}"
+
+def _sse(event: str, data) -> str:
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+async def _single(text: str):
+    yield text
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 20))
 
 @app.post("/roast")
-async def roast_photo(file: UploadFile = File(...), style: str = Form("playful")):
+async def roast_photo(file: UploadFile = File(...), style: str = Form("playful"),
+                      tier: str = Form("llm"), session_id: Optional[str] = Form(None)):
     try:
-        if not file.content_type or not file.content_type.startswith("image/"):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        features = analyzer.analyze_photo(str(file_path))
-        roast = roast_gen.generate_roast(features, style)
+        image_key, features, clip = await _analyze_upload(file)
+        if tier == "template":
+            # Zero-cost tier: template lines only, no LLM call
+            roast = roast_gen.template_roast(features, session_id)
+        else:
+            roast = await roast_gen.generate_roast_async(features, style, cache_key=_roast_key(image_key, style, clip), pool=roast_pool)
         
-        return {"roast": roast, "features": features, "style": style}
+        result = {"roast": roast, "features": features, "style": style}
+        if clip:
+            result["clip"] = clip
+        return FastJSONResponse(result)
     
     except HTTPException:
         raise
     except Exception:
-        return {
-            "roast": "I'd roast you, but I'm having technical difficulties. At least that's more functional than this photo!",
+        ENDPOINT_ERRORS.labels("roast").inc()
+        return FastJSONResponse({
+            "roast": FALLBACK_ROAST,
             "features": {"backup": True},
             "style": style
-        }
+        })
     
     finally:
-        try:
-            if 'file_path' in locals() and file_path.exists():
-                file_path.unlink()
-        except:
-            pass
+        await file.close()
+
+@app.post("/roast/stream")
+async def roast_photo_stream(file: UploadFile = File(...), style: str = Form("playful")):
+    """Send the analysis as soon as it is ready, then the roast token by token"""
+    try:
+        image_key, features, clip = await _analyze_upload(file)
+        pieces = roast_gen.stream_roast(features, style, cache_key=_roast_key(image_key, style, clip), pool=roast_pool)
+    except HTTPException:
+        raise
+    except Exception:
+        ENDPOINT_ERRORS.labels("roast_stream").inc()
+        features, clip = {"backup": True}, None
+        pieces = _single(FALLBACK_ROAST)
+    finally:
+        await file.close()
+    
+    async def events():
+        yield _sse("features", {"features": features, "style": style, **({"clip": clip} if clip else {})})
+        roast = []
+        async for text in pieces:
+            roast.append(text)
+            yield _sse("token", text)
+        yield _sse("done", {"roast": "".join(roast).strip()})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/roast/batch")
+async def roast_photo_batch(files: List[UploadFile] = File(...), style: str = Form("playful")):
+    """Roast an album: analyses run in parallel on the pool, roasts share LLM calls"""
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_FILES} files per batch")
+    
+    # Never queue more of this batch than there are workers, so one album cannot saturate the pool
+    slots = asyncio.Semaphore(analysis_pool.workers)
+    
+    async def analyze(file: UploadFile):
+        async with slots:
+            try:
+                return await _analyze_upload(file)
+            except HTTPException as e:
+                return {"error": e.detail, "status": e.status_code}
+            except Exception:
+                ENDPOINT_ERRORS.labels("roast_batch").inc()
+                return {"error": "Could not analyze image", "status": 422}
+            finally:
+                await file.close()
+    
+    analyzed = await asyncio.gather(*[analyze(file) for file in files])
+    
+    ok = [i for i, item in enumerate(analyzed) if isinstance(item, tuple)]
+    roasts = await roast_gen.generate_roasts_batch_async(
+        [analyzed[i][1] for i in ok],
+        style,
+        cache_keys=[_roast_key(analyzed[i][0], style, analyzed[i][2]) for i in ok]
+    )
+    roast_for = dict(zip(ok, roasts))
+    
+    results = []
+    for i, (file, item) in enumerate(zip(files, analyzed)):
+        if i in roast_for:
+            result = {"filename": file.filename, "roast": roast_for[i], "features": item[1]}
+            if item[2]:
+                result["clip"] = item[2]
+            results.append(result)
+        else:
+            results.append({"filename": file.filename, **item})
+    
+    return FastJSONResponse({"style": style, "results": results})
 
 @app.post("/comeback")
 async def generate_comeback(data: dict):
@@ -376,59 +339,81 @@ async def generate_comeback(data: dict):
         if not message:
             raise HTTPException(status_code=400, detail="Message is required")
         
-        comeback = roast_gen.generate_comeback(message)
-        return {"comeback": comeback}
+        comeback = await roast_gen.generate_comeback_async(message)
+        return FastJSONResponse({"comeback": comeback})
     except HTTPException:
         raise
     except Exception:
-        return {"comeback": "I'm speechless... and that's saying something for an AI!"}
+        ENDPOINT_ERRORS.labels("comeback").inc()
+        return FastJSONResponse({"comeback": "I'm speechless... and that's saying something for an AI!"})
+
+@app.post("/comeback/stream")
+async def generate_comeback_stream(data: dict):
+    message = data.get("message", "")
+    if not message:
+        raise HTTPException(status_code=400, detail="Message is required")
+    
+    async def events():
+        comeback = []
+        async for text in roast_gen.stream_comeback(message):
+            comeback.append(text)
+            yield _sse("token", text)
+        yield _sse("done", {"comeback": "".join(comeback).strip()})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.post("/chat")
 async def chat_with_ai(data: dict):
+    # History lives server-side; the client only sends the new message and its session id
+    session_id = chat_sessions.session_id(data.get("session_id"))
     try:
         message = data.get("message", "")
-        context = data.get("context", [])
         
         if not message:
             raise HTTPException(status_code=400, detail="Message is required")
         
-        # Add personality based on message content
-        if any(word in message.lower() for word in ['hello', 'hi', 'hey']):
-            response = "Well well, look who's trying to be friendly! 😄 What's up, human?"
-        elif any(word in message.lower() for word in ['funny', 'joke', 'laugh']):
-            response = "You want funny? I AM the comedy here! 🎭 But I appreciate the recognition."
-        elif any(word in message.lower() for word in ['smart', 'clever', 'intelligent']):
-            response = "Finally, someone who recognizes my genius! 🧠 I knew you had good taste."
-        elif any(word in message.lower() for word in ['mean', 'rude', 'harsh']):
-            response = "Mean? I prefer 'brutally honest'! 😈 It's called tough love, sweetie."
-        elif '?' in message:
-            response = "Questions, questions! 🤔 I'm an AI roast master, not Google! But I'll humor you..."
-        elif any(word in message.lower() for word in ['love', 'like', 'awesome']):
-            response = "Aww, you're making me blush! 😊 Well, if I could blush... which I can't... because I'm an AI... 🤖"
-        elif any(word in message.lower() for word in ['boring', 'stupid', 'dumb']):
-            response = "Excuse me?! I'm the most entertaining AI you'll ever meet! 😤 Your taste in conversation is questionable!"
-        else:
-            # Analyze message sentiment and generate contextual response
-            response = roast_gen.chat_response(message, context)
+        # Add personality based on message content (intents live in chat_intents.json)
+        response = intent_matcher.respond(message)
+        if response is None:
+            response = await roast_gen.chat_response_async(message, chat_sessions.history(session_id))
         
-        return {"response": response, "personality": "sassy"}
+        chat_sessions.append(session_id, message, response)
+        return FastJSONResponse({"response": response, "personality": "sassy", "session_id": session_id})
     except HTTPException:
         raise
     except Exception:
-        return {"response": "My circuits are having a moment... unlike your fashion sense! 🤖", "personality": "sassy"}
+        ENDPOINT_ERRORS.labels("chat").inc()
+        return FastJSONResponse({"response": "My circuits are having a moment... unlike your fashion sense! 🤖", "personality": "sassy", "session_id": session_id})
 
 @app.post("/standup")
 async def create_standup(data: dict):
     try:
-        features = data.get("features", {})
-        routine = roast_gen.create_standup_routine(features)
-        return {"routine": routine}
+        features = as_features(data.get("features", {}))
+        duration = data.get("duration", "short")
+        style = data.get("style", "playful")
+        routine = await roast_gen.create_standup_routine_async(features, duration, style)
+        return FastJSONResponse({"routine": routine})
     except Exception:
-        return {"routine": ["I'd tell you a joke about your photo, but I'm having technical difficulties!", "At least you're not as broken as my comedy generator right now!"]}
+        ENDPOINT_ERRORS.labels("standup").inc()
+        return FastJSONResponse({"routine": ["I'd tell you a joke about your photo, but I'm having technical difficulties!", "At least you're not as broken as my comedy generator right now!"]})
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "AI Roast Master is ready to roast!"}
+    return FastJSONResponse({
+        "status": "healthy",
+        "message": "AI Roast Master is ready to roast!",
+        "pools": {"analyzer": analysis_pool.stats()},
+        "caches": {"features": feature_cache.stats(), "roasts": roast_cache.stats()},
+        "near_duplicates": near_duplicates.stats(),
+        "llm_coalescing": roast_gen.flights.stats(),
+        "roast_pool": roast_pool.stats(),
+        "chat_sessions": chat_sessions.stats()
+    })
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of stage latencies, LLM outcomes, fallbacks and component stats"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
     import uvicorn
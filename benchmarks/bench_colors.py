@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Per-image CPU cost of ImageAnalyzer._analyze_colors.
+
+Colour analysis works on a fixed-size sample, so its cost should not grow
+with the input resolution. The script exits non-zero when the p95 latency
+at any size exceeds the budget, so it can gate a deploy:
+
+    python benchmarks/bench_colors.py --budget-ms 5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from image_analyzer import ImageAnalyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='0.3,2,12,48', help='comma-separated input sizes')
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--budget-ms', type=float, default=5.0, help='maximum allowed p95 per image')
+    args = parser.parse_args()
+
+    analyzer = ImageAnalyzer()
+    rng = np.random.default_rng(0)
+    over_budget = False
+
+    print(f"{'MP':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for mp in (float(v) for v in args.megapixels.split(',')):
+        height = int((mp * 1_000_000 * 3 / 4) ** 0.5)
+        image = rng.integers(0, 256, size=(height, height * 4 // 3, 3), dtype=np.uint8)
+
+        timings = []
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            analyzer._analyze_colors(image)
+            timings.append((time.perf_counter() - start) * 1000)
+        p50, p95 = np.percentile(timings, [50, 95])
+        flag = '  OVER BUDGET' if p95 > args.budget_ms else ''
+        over_budget |= p95 > args.budget_ms
+        print(f"{mp:>6.1f} {p50:>8.2f} {p95:>8.2f}{flag}")
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == '__main__':
+    main()
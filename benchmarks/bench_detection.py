@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Face detection latency vs. input megapixels.
+
+Compares full-resolution analysis with the downscaled working-resolution
+mode of ImageAnalyzer. Run from the project root:
+
+    python benchmarks/bench_detection.py --megapixels 1,4,12,24
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from image_analyzer import ImageAnalyzer
+
+
+def synthetic_photo(megapixels, seed=0):
+    """Blurry, photo-like texture of roughly the requested size (4:3).
+
+    The coarse grid is fixed so every size shows the same scene, only sampled
+    at a different resolution.
+    """
+    rng = np.random.default_rng(seed)
+    height = int((megapixels * 1_000_000 * 3 / 4) ** 0.5)
+    width = int(height * 4 / 3)
+    coarse = rng.integers(0, 256, size=(48, 64, 3), dtype=np.uint8)
+    return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def time_analysis(analyzer, image, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        analyzer._analyze_image(image)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='0.5,2,8,12', help='comma-separated input sizes')
+    parser.add_argument('--working-size', type=int, default=1280, help='longest side for the downscaled mode')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--skip-full', action='store_true', help='only time the downscaled mode')
+    args = parser.parse_args()
+
+    full = ImageAnalyzer(working_size=0)
+    scaled = ImageAnalyzer(working_size=args.working_size)
+
+    print(f"{'MP':>6} {'size':>12} {'full ms':>10} {'scaled ms':>10} {'speedup':>8}")
+    for mp in (float(v) for v in args.megapixels.split(',')):
+        image = synthetic_photo(mp)
+        size = f"{image.shape[1]}x{image.shape[0]}"
+        scaled_ms = time_analysis(scaled, image, args.repeats)
+        if args.skip_full:
+            print(f"{mp:>6.1f} {size:>12} {'-':>10} {scaled_ms:>10.1f} {'-':>8}")
+            continue
+        full_ms = time_analysis(full, image, args.repeats)
+        print(f"{mp:>6.1f} {size:>12} {full_ms:>10.1f} {scaled_ms:>10.1f} {full_ms / scaled_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
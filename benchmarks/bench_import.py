@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of importing the API.
+
+Times `import api` in fresh interpreters and compares it with importing
+everything the API used to load eagerly (OpenCV, numpy, PIL, the OpenAI
+SDK and a constructed ImageAnalyzer). Prints JSON:
+
+    python benchmarks/bench_import.py --repeats 10
+"""
+
+import argparse
+import subprocess
+import sys
+
+from harness import PROJECT_DIR, summarize, write_report
+
+HEAVY_MODULES = ('cv2', 'numpy', 'PIL', 'openai')
+
+SCENARIOS = {
+    'lazy': 'import api',
+    'eager': 'import api, cv2, numpy, PIL.Image, openai, image_analyzer; image_analyzer.ImageAnalyzer()',
+}
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def run(statement):
+    """Wall time of `statement` in a fresh interpreter, and the heavy modules it left loaded"""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1].split(',') if len(output) > 1 else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--out', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {}
+    for name, statement in SCENARIOS.items():
+        run(statement)  # Warm the OS page cache and bytecode caches first
+        timings, loaded = [], []
+        for _ in range(args.repeats):
+            elapsed, loaded = run(statement)
+            timings.append(elapsed)
+        report[name] = {**summarize(timings), 'heavy_modules_loaded': loaded}
+
+    report['saved_p50_ms'] = round(report['eager']['p50_ms'] - report['lazy']['p50_ms'], 3)
+    write_report(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Per-message cost of /chat intent matching as the keyword vocabulary grows.
+
+Builds IntentMatcher instances with synthetic vocabularies of increasing
+size and times classify() on a fixed set of messages. Run from the
+project root:
+
+    python benchmarks/bench_intents.py --sizes 10,100,1000,10000
+"""
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from intent_matcher import IntentMatcher
+
+MESSAGES = [
+    "hey there, roast me please",
+    "this is not funny at all",
+    "why would anyone think that is clever?",
+    "I really love how mean you are to everybody here",
+    "just a long message about nothing in particular that keeps going and going without any keyword",
+]
+
+
+def synthetic_intents(vocab_size, intents=10, seed=0):
+    """Real intents plus random keywords spread over extra intents"""
+    rng = random.Random(seed)
+    real = IntentMatcher.from_file().intents
+    words = set()
+    while len(words) < vocab_size:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10))))
+    words = sorted(words)
+    extra = [
+        {'intent': f'synthetic_{i}', 'keywords': words[i::intents], 'response': f'synthetic {i}'}
+        for i in range(intents)
+    ]
+    return real + extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='comma-separated vocabulary sizes')
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'keywords':>10} {'build ms':>10} {'us/message':>12}")
+    for size in (int(v) for v in args.sizes.split(',')):
+        start = time.perf_counter()
+        matcher = IntentMatcher(synthetic_intents(size))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for i in range(args.iterations):
+            matcher.classify(MESSAGES[i % len(MESSAGES)])
+        per_message = (time.perf_counter() - start) / args.iterations * 1e6
+        print(f"{size:>10} {build_ms:>10.1f} {per_message:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
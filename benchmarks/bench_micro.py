@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for each ImageAnalyzer and RoastGenerator method.
+
+Analyzer methods run over the synthetic corpus (see corpus.py), grouped by
+image size. Generator methods that call the LLM run against a stub server
+started for the run, with no cache, so they measure the client path and
+not the model. Results are printed (and optionally saved) as JSON:
+
+    python benchmarks/bench_micro.py --repeats 20 --out micro.json
+    python benchmarks/bench_micro.py --only analyze_bytes,generate_roast_async
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import cv2
+import numpy as np
+
+from corpus import build_corpus, parse_list
+from harness import llm_env, stub_llm, summarize, write_report
+
+
+def time_calls(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def time_async_calls(fn, repeats):
+    async def run():
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await fn()
+            latencies.append(time.perf_counter() - start)
+        return latencies
+    return summarize(asyncio.run(run()))
+
+
+async def _drain(stream):
+    async for _ in stream:
+        pass
+
+
+def bench_analyzer(corpus, repeats, wanted):
+    from image_analyzer import ImageAnalyzer
+
+    analyzer = ImageAnalyzer()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for entry in corpus:
+            label = entry['name']
+            path = Path(tmp) / label
+            path.write_bytes(entry['data'])
+            data = entry['data']
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            small, _ = analyzer._working_frame(gray)
+            faces = analyzer.face_cascade.detectMultiScale(small, 1.1, 4)
+
+            methods = {
+                'analyze_photo': lambda: analyzer.analyze_photo(str(path)),
+                'analyze_bytes': lambda: analyzer.analyze_bytes(data),
+                'analyze_bytes_fingerprint': lambda: analyzer.analyze_bytes(data, fingerprint=True),
+                '_analyze_image': lambda: analyzer._analyze_image(image),
+                '_working_frame': lambda: analyzer._working_frame(gray),
+                '_detect_faces': lambda: analyzer._detect_faces(faces),
+                '_detect_objects': lambda: analyzer._detect_objects(small, faces),
+                '_analyze_colors': lambda: analyzer._analyze_colors(image),
+                '_analyze_composition': lambda: analyzer._analyze_composition(image),
+            }
+            for name, fn in methods.items():
+                if wanted(name):
+                    results.setdefault(name, {})[label] = time_calls(fn, repeats)
+    return results
+
+
+def bench_generator(features, repeats, wanted, llm_latency_ms):
+    results = {}
+    with stub_llm(latency_ms=llm_latency_ms) as base_url:
+        os.environ.update(llm_env(base_url))
+        from roast_generator import RoastGenerator
+
+        # No cache and no result reuse, so every call reaches the (stub) LLM
+        generator = RoastGenerator()
+        generator.flights.ttl = 0
+        generator.warm_up()  # Keep the one-off SDK import out of the first timing
+        roast = generator.template_roast(features)
+        batch = [features] * generator.batch_size
+
+        sync_methods = {
+            'template_roast': lambda: generator.template_roast(features),
+            '_filter_content': lambda: generator._filter_content(roast),
+            '_build_roast_prompt': lambda: generator._build_roast_prompt(features, 'savage'),
+            '_fallback_comeback': lambda: generator._fallback_comeback(),
+            'generate_roast': lambda: generator.generate_roast(features, 'savage'),
+            'generate_comeback': lambda: generator.generate_comeback("Your code is slow"),
+            'create_standup_routine': lambda: generator.create_standup_routine(features, 'medium'),
+        }
+        async_methods = {
+            'generate_roast_async': lambda: generator.generate_roast_async(features, 'savage'),
+            'generate_roasts_batch_async': lambda: generator.generate_roasts_batch_async(batch, 'savage'),
+            'generate_comeback_async': lambda: generator.generate_comeback_async("Your code is slow"),
+            'create_standup_routine_async': lambda: generator.create_standup_routine_async(features, 'medium'),
+            'stream_roast': lambda: _drain(generator.stream_roast(features, 'savage')),
+            'stream_comeback': lambda: _drain(generator.stream_comeback("Your code is slow")),
+        }
+        for name, fn in sync_methods.items():
+            if wanted(name):
+                results[name] = time_calls(fn, repeats)
+        for name, fn in async_methods.items():
+            if wanted(name):
+                # Each method gets its own event loop, so the pooled client is rebuilt per run
+                generator._async_client = None
+                generator._llm_slots = asyncio.Semaphore(generator.max_concurrency)
+                results[name] = time_async_calls(fn, repeats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='0.3,2,12', help='corpus image sizes')
+    parser.add_argument('--faces', default='0,1,3', help='corpus face counts')
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='stub LLM delay per request')
+    parser.add_argument('--only', default='', help='comma-separated method names to run (default: all)')
+    parser.add_argument('--skip-analyzer', action='store_true')
+    parser.add_argument('--skip-generator', action='store_true')
+    parser.add_argument('--out', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    only = set(parse_list(args.only, str))
+    wanted = (lambda name: name in only) if only else (lambda name: True)
+    corpus = build_corpus(parse_list(args.megapixels), parse_list(args.faces, int))
+
+    report = {
+        'config': {'megapixels': args.megapixels, 'faces': args.faces, 'repeats': args.repeats,
+                   'llm_latency_ms': args.llm_latency_ms}
+    }
+    if not args.skip_analyzer:
+        report['analyzer'] = bench_analyzer(corpus, args.repeats, wanted)
+    if not args.skip_generator:
+        from image_analyzer import ImageAnalyzer
+        features = ImageAnalyzer().analyze_bytes(corpus[-1]['data'])
+        report['generator'] = bench_generator(features, args.repeats, wanted, args.llm_latency_ms)
+
+    write_report(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cost of holding and returning photo features: plain dicts through FastAPI's
+default encoder versus PhotoFeatures records through FastJSONResponse.
+
+For each corpus image it analyses the photo once, then reports per
+/roast-shaped response the render time, peak bytes allocated while
+rendering, the memory one feature set keeps alive and its pickled size
+(what the result cache and the process pool move around). Prints JSON:
+
+    python benchmarks/bench_serialize.py --repeats 2000 --faces 0,3,8
+"""
+
+import argparse
+import json
+import pickle
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import json_response
+from corpus import build_corpus, parse_list
+from harness import summarize, write_report
+from image_analyzer import ImageAnalyzer
+from json_response import FastJSONResponse
+from photo_features import PhotoFeatures
+
+ROAST = "That photo has the lighting of a submarine and the confidence of a lighthouse."
+
+
+def legacy_response(features):
+    """What FastAPI does with a returned dict: jsonable_encoder, then json.dumps"""
+    return JSONResponse(jsonable_encoder({'roast': ROAST, 'features': features, 'style': 'savage'}))
+
+
+def fast_response(features):
+    return FastJSONResponse({'roast': ROAST, 'features': features, 'style': 'savage'})
+
+
+def stdlib_response(features):
+    """FastJSONResponse where orjson is not installed"""
+    saved, json_response.orjson = json_response.orjson, None
+    try:
+        return FastJSONResponse({'roast': ROAST, 'features': features, 'style': 'savage'})
+    finally:
+        json_response.orjson = saved
+
+
+def timed(render, features, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        render(features)
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def peak_bytes(fn, *args):
+    """Most memory allocated at once while fn runs"""
+    tracemalloc.start()
+    try:
+        tracemalloc.clear_traces()
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_bytes(build, payload):
+    """Memory one feature set keeps alive once built from its JSON form"""
+    build(payload)  # Warm up
+    tracemalloc.start()
+    try:
+        tracemalloc.clear_traces()
+        held = build(payload)
+        size = tracemalloc.get_traced_memory()[0]
+        del held
+        return size
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--megapixels', default='2', help='corpus image sizes')
+    parser.add_argument('--faces', default='0,3,8', help='corpus face counts')
+    parser.add_argument('--repeats', type=int, default=2000)
+    parser.add_argument('--out', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    analyzer = ImageAnalyzer()
+    report = {'orjson': json_response.orjson is not None, 'images': {}}
+    for entry in build_corpus(parse_list(args.megapixels), parse_list(args.faces, int), ('jpeg',)):
+        record = analyzer.analyze_bytes(entry['data'])
+        # The same features as plain dicts of native types, the shape the API returned before
+        features = json.loads(json_response.dumps(record))
+        assert legacy_response(features).body == JSONResponse(json.loads(fast_response(record).body)).body
+
+        result = {'faces_detected': record.faces.count}
+        for name, render, value in (('dict_default', legacy_response, features),
+                                    ('record_fast', fast_response, record),
+                                    ('record_stdlib', stdlib_response, record)):
+            render(value)  # Warm up
+            result[name] = {
+                **timed(render, value, args.repeats),
+                'render_peak_bytes': peak_bytes(render, value)
+            }
+        payload = json_response.dumps(record)
+        for name, value, build in (('dict_default', features, json.loads),
+                                   ('record_fast', record, lambda data: PhotoFeatures.from_dict(json.loads(data)))):
+            result[name]['retained_bytes'] = retained_bytes(build, payload)
+            result[name]['pickled_bytes'] = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        result['speedup_p50'] = round(result['dict_default']['p50_ms'] / result['record_fast']['p50_ms'], 2)
+        report['images'][entry['name']] = result
+
+    write_report(report, args.out)
+
+
+if __name__ == '__main__':
+    main()
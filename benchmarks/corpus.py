@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Synthetic, reproducible image corpus for the benchmarks and load test.
+
+Each image is a blurry photo-like background with a number of drawn
+cartoon faces that the Haar cascade picks up, saved as JPEG or PNG. The
+same seed always produces the same bytes. Run from the project root:
+
+    python benchmarks/corpus.py --out /tmp/roast-corpus --megapixels 0.3,2,12 --faces 0,1,3
+
+A manifest.json next to the images records each file's size, format and
+number of faces drawn.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FORMATS = {'jpeg': ('.jpg', [cv2.IMWRITE_JPEG_QUALITY, 90]), 'png': ('.png', [cv2.IMWRITE_PNG_COMPRESSION, 3])}
+
+
+def _background(width, height, rng):
+    """Blurry texture; the coarse grid is fixed so every size shows the same kind of scene"""
+    coarse = rng.integers(70, 170, size=(12, 16, 3), dtype=np.uint8)
+    return cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC)
+
+
+def _draw_face(image, cx, cy, size):
+    """Skin-tone oval with brows, eyes, nose and mouth; enough for a frontal-face cascade"""
+    def axes(a, b):
+        return (max(1, int(size * a)), max(1, int(size * b)))
+
+    cv2.ellipse(image, (cx, cy), axes(0.42, 0.55), 0, 0, 360, (150, 180, 225), -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(size * 0.17), cy - int(size * 0.1)
+        cv2.ellipse(image, (ex, ey - int(size * 0.09)), axes(0.11, 0.025), 0, 0, 360, (40, 50, 70), -1)
+        cv2.ellipse(image, (ex, ey), axes(0.08, 0.045), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(image, (ex, ey), max(1, int(size * 0.035)), (30, 30, 30), -1)
+    cv2.ellipse(image, (cx, cy + int(size * 0.08)), axes(0.04, 0.1), 0, 0, 360, (120, 150, 200), -1)
+    cv2.ellipse(image, (cx, cy + int(size * 0.28)), axes(0.15, 0.05), 0, 0, 360, (60, 60, 150), -1)
+
+
+def synthetic_image(megapixels, faces=0, seed=0):
+    """BGR image of roughly the requested size (4:3) with `faces` faces in a row"""
+    rng = np.random.default_rng(seed)
+    height = max(32, int((megapixels * 1_000_000 * 3 / 4) ** 0.5))
+    width = height * 4 // 3
+    image = _background(width, height, rng)
+
+    if faces:
+        # Faces share the middle band, each in its own column
+        size = int(min(height * 0.45, width / faces * 0.6))
+        for i in range(faces):
+            cx = int(width * (i + 0.5) / faces)
+            _draw_face(image, cx, height // 2, size)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+def encode(image, fmt='jpeg'):
+    suffix, params = FORMATS[fmt]
+    ok, buffer = cv2.imencode(suffix, image, params)
+    if not ok:
+        raise ValueError(f"Could not encode image as {fmt}")
+    return buffer.tobytes()
+
+
+def build_corpus(megapixels=(0.3, 2.0, 12.0), faces=(0, 1, 3), formats=('jpeg',), seed=0):
+    """Every size x face count x format combination as in-memory entries"""
+    corpus = []
+    for mp in megapixels:
+        for count in faces:
+            image = synthetic_image(mp, count, seed=seed)
+            for fmt in formats:
+                suffix = FORMATS[fmt][0]
+                corpus.append({
+                    'name': f"mp{mp:g}_faces{count}{suffix}",
+                    'megapixels': mp,
+                    'width': image.shape[1],
+                    'height': image.shape[0],
+                    'faces': count,
+                    'format': fmt,
+                    'data': encode(image, fmt)
+                })
+    return corpus
+
+
+def parse_list(value, cast=float):
+    return tuple(cast(v) for v in value.split(',') if v)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', required=True, help='directory to write the images and manifest.json to')
+    parser.add_argument('--megapixels', default='0.3,2,12', help='comma-separated image sizes')
+    parser.add_argument('--faces', default='0,1,3', help='comma-separated face counts')
+    parser.add_argument('--formats', default='jpeg', help='comma-separated formats (jpeg, png)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    corpus = build_corpus(parse_list(args.megapixels), parse_list(args.faces, int), parse_list(args.formats, str), args.seed)
+
+    manifest = []
+    for entry in corpus:
+        (out / entry['name']).write_bytes(entry['data'])
+        manifest.append({key: value for key, value in entry.items() if key != 'data'} | {'bytes': len(entry['data'])})
+    (out / 'manifest.json').write_text(json.dumps(manifest, indent=2))
+    print(f"Wrote {len(manifest)} images to {out}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Helpers shared by bench_micro.py and load_test.py: latency summaries and
+starting the stub LLM server or the API as child processes.
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCH_DIR.parent
+
+
+def summarize(latencies, elapsed=None, errors=0):
+    """p50/p95/p99 in milliseconds, plus throughput when the wall time is known"""
+    summary = {'count': len(latencies), 'errors': errors}
+    if latencies:
+        ms = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        summary.update({
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'mean_ms': round(float(ms.mean()), 3),
+            'max_ms': round(float(ms.max()), 3)
+        })
+    if elapsed:
+        summary['throughput_rps'] = round(len(latencies) / elapsed, 2)
+    return summary
+
+
+def write_report(report, path=None):
+    """Print the JSON report, and also save it when a path is given"""
+    text = json.dumps(report, indent=2)
+    if path:
+        Path(path).write_text(text + '\n')
+    print(text)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing is listening on port {port} after {timeout}s")
+
+
+@contextmanager
+def child_process(args, port, env=None):
+    """Run a server in a child process for the duration of the block"""
+    process = subprocess.Popen(
+        [sys.executable, *args],
+        cwd=PROJECT_DIR,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextmanager
+def stub_llm(latency_ms=50.0, jitter_ms=0.0):
+    """Start benchmarks/stub_llm.py and yield the OPENAI_BASE_URL to use"""
+    port = free_port()
+    args = [str(BENCH_DIR / 'stub_llm.py'), '--port', str(port), '--latency-ms', str(latency_ms), '--jitter-ms', str(jitter_ms)]
+    with child_process(args, port):
+        yield f"http://127.0.0.1:{port}/v1"
+
+
+def llm_env(base_url):
+    """Environment pointing RoastGenerator at a stub server"""
+    return {'OPENAI_API_KEY': 'stub', 'OPENAI_BASE_URL': base_url}
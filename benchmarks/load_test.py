@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+End-to-end load generator for /roast, /chat, /comeback and /standup.
+
+By default it starts the stub LLM server (stub_llm.py) and the API on
+free local ports, then drives each endpoint in turn at a fixed
+concurrency and prints p50/p95/p99 latency, throughput and error counts
+as JSON. Pass --url to load an already running server instead.
+
+    python benchmarks/load_test.py --concurrency 16 --requests 400 --out load.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8001 --endpoints roast,chat
+
+With --max-p95-ms or --max-error-rate it exits non-zero when any endpoint
+is over the limit, so it can gate a deploy. Uploads cycle through the
+synthetic corpus; --unique-uploads appends a random trailer to each one so
+the exact-content feature cache never hits.
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from corpus import build_corpus, parse_list
+from harness import child_process, free_port, llm_env, stub_llm, summarize, write_report
+
+STYLES = ('playful', 'savage', 'sarcastic', 'absurd')
+CHAT_MESSAGES = (
+    "hello there", "roast me please", "that was not funny", "why are you like this?",
+    "tell me something nice for once", "my friend says my photos are great",
+)
+COMEBACKS = ("You look like a broken printer", "Your jokes are older than my router", "Is that all you've got?")
+STANDUP_FEATURES = {
+    'faces': {'count': 1, 'features': [{'width': 180, 'height': 200, 'ratio': 0.9, 'size': 'medium'}]},
+    'objects': {'glasses': False, 'multiple_people': False},
+    'colors': {'theme': 'dark'},
+    'composition': {'resolution': 'high', 'orientation': 'portrait'}
+}
+
+
+def request_factories(corpus, unique_uploads):
+    """endpoint -> function(i) returning the keyword arguments for one client.request call"""
+    def roast(i):
+        entry = corpus[i % len(corpus)]
+        data = entry['data'] + (os.urandom(16) if unique_uploads else b'')
+        mime = 'image/png' if entry['format'] == 'png' else 'image/jpeg'
+        return {'method': 'POST', 'url': '/roast', 'files': {'file': (entry['name'], data, mime)},
+                'data': {'style': STYLES[i % len(STYLES)]}}
+
+    return {
+        'roast': roast,
+        'chat': lambda i: {'method': 'POST', 'url': '/chat',
+                           'json': {'message': CHAT_MESSAGES[i % len(CHAT_MESSAGES)], 'session_id': f"load-{i % 50}"}},
+        'comeback': lambda i: {'method': 'POST', 'url': '/comeback', 'json': {'message': COMEBACKS[i % len(COMEBACKS)]}},
+        'standup': lambda i: {'method': 'POST', 'url': '/standup',
+                              'json': {'features': STANDUP_FEATURES, 'duration': 'medium', 'style': STYLES[i % len(STYLES)]}},
+    }
+
+
+async def drive(client, make_request, total, concurrency):
+    """Issue `total` requests with `concurrency` in flight; returns latencies, errors and wall time"""
+    counter = itertools.count()
+    latencies = []
+    errors = {}
+
+    async def worker():
+        while (i := next(counter)) < total:
+            start = time.perf_counter()
+            try:
+                response = await client.request(**make_request(i))
+                outcome = None if response.status_code < 400 else str(response.status_code)
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            if outcome is None:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_load(url, endpoints, factories, requests, concurrency, warmup, timeout):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as client:
+        for endpoint in endpoints:
+            make_request = factories[endpoint]
+            if warmup:
+                await drive(client, make_request, warmup, min(concurrency, warmup))
+            latencies, errors, elapsed = await drive(client, make_request, requests, concurrency)
+            summary = summarize(latencies, elapsed, errors=sum(errors.values()))
+            if errors:
+                summary['error_kinds'] = errors
+            results[endpoint] = summary
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='base URL of a running server (default: start stub LLM and API locally)')
+    parser.add_argument('--endpoints', default='roast,chat,comeback,standup')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per endpoint first')
+    parser.add_argument('--timeout', type=float, default=30.0, help='client timeout per request (s)')
+    parser.add_argument('--megapixels', default='0.3,2,12', help='corpus image sizes for /roast')
+    parser.add_argument('--faces', default='0,1,3', help='corpus face counts for /roast')
+    parser.add_argument('--unique-uploads', action='store_true', help='defeat the exact-content feature cache')
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0, help='stub LLM delay when started locally')
+    parser.add_argument('--llm-jitter-ms', type=float, default=10.0)
+    parser.add_argument('--max-p95-ms', type=float, help='fail when any endpoint p95 exceeds this')
+    parser.add_argument('--max-error-rate', type=float, help='fail when any endpoint error share exceeds this (0-1)')
+    parser.add_argument('--out', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    endpoints = parse_list(args.endpoints, str)
+    factories = request_factories(build_corpus(parse_list(args.megapixels), parse_list(args.faces, int)), args.unique_uploads)
+    unknown = set(endpoints) - factories.keys()
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    with ExitStack() as stack:
+        url = args.url
+        if url is None:
+            base_url = stack.enter_context(stub_llm(args.llm_latency_ms, args.llm_jitter_ms))
+            port = free_port()
+            stack.enter_context(child_process(
+                ['-m', 'uvicorn', 'api:app', '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning'],
+                port, env=llm_env(base_url)
+            ))
+            url = f"http://127.0.0.1:{port}"
+
+        results = asyncio.run(run_load(url, endpoints, factories, args.requests, args.concurrency, args.warmup, args.timeout))
+
+    failures = []
+    for endpoint, summary in results.items():
+        if args.max_p95_ms is not None and summary.get('p95_ms', float('inf')) > args.max_p95_ms:
+            failures.append(f"{endpoint}: p95 {summary.get('p95_ms')} ms > {args.max_p95_ms} ms")
+        if args.max_error_rate is not None and summary['errors'] / args.requests > args.max_error_rate:
+            failures.append(f"{endpoint}: {summary['errors']} errors in {args.requests} requests")
+
+    write_report({
+        'config': {'url': args.url or 'local', 'concurrency': args.concurrency, 'requests': args.requests,
+                   'unique_uploads': args.unique_uploads, 'llm_latency_ms': None if args.url else args.llm_latency_ms},
+        'endpoints': results,
+        'failures': failures
+    }, args.out)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible stub LLM server for benchmarks and load tests.
+
+Answers /v1/chat/completions after a fixed (optionally jittered) delay,
+with the reply shapes RoastGenerator asks for: plain text, streamed
+chunks, a JSON array for batch roasts and a JSON object for stand-up
+routines. Point the app at it with
+
+    python benchmarks/stub_llm.py --port 8765 --latency-ms 50
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python api.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+REPLY = "That photo has the lighting of a submarine and the confidence of a lighthouse."
+
+app = FastAPI()
+app.state.latency = 0.05
+app.state.jitter = 0.0
+
+
+def _completion(model, content):
+    return {
+        "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    }
+
+
+def _reply_for(prompt):
+    """Reply text in the shape the prompt asks for"""
+    batch = re.search(r"JSON array of (\d+) strings", prompt)
+    if batch:
+        return json.dumps([f"Photo {i} roast: {REPLY}" for i in range(1, int(batch.group(1)) + 1)])
+    if "JSON object shaped" in prompt:
+        routine = {"middle": ["The background is doing most of the work here."], "closer": "Goodnight, everybody!"}
+        if '"opening"' in prompt:
+            routine["opening"] = REPLY
+        return json.dumps(routine)
+    return REPLY
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(max(0.0, app.state.latency + random.uniform(-app.state.jitter, app.state.jitter)))
+    content = _reply_for(body["messages"][-1]["content"])
+
+    if not body.get("stream"):
+        return _completion(body["model"], content)
+
+    async def chunks():
+        for i in range(0, len(content), 8):
+            chunk = {
+                "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='delay before each reply')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='uniform +/- jitter on the delay')
+    args = parser.parse_args()
+
+    app.state.latency = args.latency_ms / 1000
+    app.state.jitter = args.jitter_ms / 1000
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+MAX_SESSION_ID_LENGTH = 64
+
+
+def _turn_bytes(turn):
+    return len(turn[0].encode('utf-8')) + len(turn[1].encode('utf-8'))
+
+
+class _Session:
+    __slots__ = ('turns', 'bytes', 'touched_at')
+
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # (user, ai) pairs, oldest dropped first
+        self.bytes = 0
+        self.touched_at = time.monotonic()
+
+
+class ChatSessions:
+    """Recent chat turns per session, kept server-side so clients only send the new message"""
+
+    def __init__(self, max_turns=None, ttl=None, max_sessions=None, max_bytes=None, max_chars=500):
+        self.max_turns = int(max_turns or os.getenv('CHAT_HISTORY_TURNS', 5))
+        self.ttl = float(ttl or os.getenv('CHAT_SESSION_TTL', 1800))
+        self.max_sessions = int(max_sessions or os.getenv('CHAT_MAX_SESSIONS', 10000))
+        self.max_bytes = int(max_bytes or os.getenv('CHAT_SESSIONS_MAX_BYTES', 16 * 1024 * 1024))
+        self.max_chars = max_chars  # Longer messages are stored truncated
+
+        self._sessions = OrderedDict()  # session id -> _Session, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def session_id(self, requested=None):
+        """The client's session id if it is usable, otherwise a fresh one"""
+        if requested and isinstance(requested, str) and len(requested) <= MAX_SESSION_ID_LENGTH:
+            return requested
+        return secrets.token_urlsafe(16)
+
+    def history(self, session_id):
+        """The session's stored (user, ai) turns, oldest first"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            session.touched_at = time.monotonic()
+            return list(session.turns)
+
+    def append(self, session_id, user, ai):
+        """Record one exchange, dropping the session's oldest turn once it is full"""
+        turn = (user[:self.max_chars], ai[:self.max_chars])
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                session = _Session(self.max_turns)
+            size = _turn_bytes(turn)
+            if len(session.turns) == session.turns.maxlen:
+                size -= _turn_bytes(session.turns[0])
+            session.turns.append(turn)
+            session.bytes += size
+            session.touched_at = time.monotonic()
+            self._sessions[session_id] = session
+            self._bytes += size
+            self._expire()
+            self._evict()
+
+    def _expire(self):
+        """Drop idle sessions; the LRU order means they are all at the front"""
+        deadline = time.monotonic() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.touched_at > deadline:
+                break
+            self._drop(session_id)
+            self.expired += 1
+
+    def _evict(self):
+        """Drop least recently used sessions while over the session or memory budget"""
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions)))
+            self.evicted += 1
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
@@ -0,0 +1,351 @@
+import asyncio
+import io
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis_pool import PoolSaturated
+from image_guard import VIDEO_FORMATS, ImageRejected
+from photo_features import Colors, Composition, Faces, Objects, PhotoFeatures
+
+# Scene changes are measured on tiny grayscale thumbnails
+THUMB_SIDE = 32
+
+
+def frame_delay(ms):
+    """Seconds a GIF frame is shown: browsers show frames of 10 ms or less (often written as 0) for 100 ms"""
+    return (ms if ms > 10 else 100) / 1000
+
+
+def gif_length(data):
+    """Total GIF play time (s) from its frame delays, walking blocks without decoding; None if malformed"""
+    length, delay = 0.0, 0
+    try:
+        flags = data[10]
+        at = 13 + (3 << (flags & 7) + 1 if flags & 0x80 else 0)  # Header, screen descriptor, global palette
+        while data[at] != 0x3B:  # Trailer
+            if data[at] == 0x21:  # Extension: label, then data sub-blocks
+                if data[at + 1] == 0xF9:  # Graphic control: delay of the next frame in 1/100 s
+                    delay = int.from_bytes(data[at + 4:at + 6], 'little') * 10
+                at += 2
+            elif data[at] == 0x2C:  # Frame: descriptor, local palette, LZW code size, data sub-blocks
+                flags = data[at + 9]
+                at += 10 + (3 << (flags & 7) + 1 if flags & 0x80 else 0) + 1
+                length += frame_delay(delay)
+                delay = 0
+            else:
+                return None
+            while data[at]:
+                at += data[at] + 1
+            at += 1
+        return length
+    except IndexError:
+        return length or None  # Truncated files still play what they have
+
+
+class FrameSampler:
+    """Decode a GIF or video one frame at a time and yield the frames worth analysing.
+
+    A frame is sampled when it differs enough from the last sampled frame (a
+    scene change) or when max_gap seconds have passed without a sample. When
+    the clip's length is known, samples are at least length / max_frames
+    apart so scene changes cannot use up max_frames before the end; otherwise
+    they are at least a quarter of max_gap apart. Only the current frame is
+    ever held, so memory does not depend on clip length.
+    """
+
+    def __init__(self, data, header, max_frames, scene_threshold, max_side, max_pixels, deadline=None):
+        self.data = data
+        self.header = header
+        self.max_frames = max_frames
+        self.scene_threshold = scene_threshold
+        self.max_side = max_side
+        self.max_pixels = max_pixels
+        self.deadline = deadline  # time.monotonic() after which no more frames are decoded
+        self.seen = 0  # Frames decoded or skipped so far
+        self.duration = 0.0  # Clip time reached so far (s)
+        self.length = None  # Whole clip length (s), where the container records it
+        self.truncated = False  # Stopped at max_frames or the deadline with part of the clip never sampled
+
+    def __iter__(self):
+        import cv2
+        import numpy as np
+
+        frames = self._video_frames() if self.header.format in VIDEO_FORMATS else self._image_frames()
+        try:
+            self.length = next(frames)
+            if self.length:
+                spacing = self.length / self.max_frames
+                max_gap = 2 * spacing
+            else:
+                max_gap = 1.0  # Sample at least every second
+                spacing = max_gap / 4
+            last_thumb, last_at, sampled = None, None, 0
+            for timestamp, frame in frames:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    self.truncated = True  # Out of time; nobody is waiting for more frames
+                    return
+                if frame is None:
+                    continue  # Skipped without decoding
+                gap = timestamp - last_at if last_at is not None else max_gap
+                if gap < spacing:
+                    continue
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                thumb = cv2.resize(gray, (THUMB_SIDE, THUMB_SIDE), interpolation=cv2.INTER_AREA).astype(np.int16)
+                if gap < max_gap and np.abs(thumb - last_thumb).mean() < self.scene_threshold:
+                    continue
+                last_thumb, last_at = thumb, timestamp
+                yield self._shrink(frame)
+                sampled += 1
+                if sampled >= self.max_frames:
+                    # Partial if the rest of the clip would still have been sampled
+                    if self.length:
+                        self.truncated = self.length - last_at > max_gap
+                    else:
+                        self.truncated = next(frames, None) is not None
+                    return
+        finally:
+            frames.close()
+
+    def _shrink(self, frame):
+        """Downscale to the analyzer's working size; returns the frame and its decode ratio"""
+        import cv2
+
+        h, w = frame.shape[:2]
+        longest = max(h, w)
+        if not self.max_side or longest <= self.max_side:
+            return frame, 1.0
+        scale = self.max_side / longest
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+    def _image_frames(self):
+        """Frames of an animated GIF, WebP or PNG through PIL's frame iterator"""
+        import numpy as np
+        from PIL import Image, ImageSequence
+
+        # WebP and PNG lengths are unknown without decoding every frame
+        yield gif_length(self.data) if self.header.format == 'GIF' else None
+        with Image.open(io.BytesIO(self.data)) as image:
+            for frame in ImageSequence.Iterator(image):
+                timestamp = self.duration
+                self.seen += 1
+                self.duration += frame_delay(frame.info.get('duration') or 0)
+                yield timestamp, np.ascontiguousarray(np.asarray(frame.convert('RGB'))[:, :, ::-1])
+
+    def _video_frames(self):
+        """Frames of a video through cv2.VideoCapture; only a few per second are fully decoded"""
+        import cv2
+
+        capture, source = self._open_capture()
+        try:
+            width = capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+            height = capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+            if width * height > self.max_pixels:
+                raise ImageRejected(413, f"Video frames have more than {self.max_pixels} pixels")
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+            yield count / fps if count > 0 else None
+
+            probe = max(1, round(fps / 8))  # Scene checks eight times a second
+            while True:
+                timestamp = self.seen / fps
+                if self.seen % probe:
+                    ok, frame = capture.grab(), None
+                else:
+                    ok, frame = capture.read()
+                if not ok:
+                    return
+                self.seen += 1
+                self.duration = self.seen / fps
+                yield timestamp, frame
+        finally:
+            capture.release()  # Reads from `source` one last time, so it must still be alive here
+            if isinstance(source, str):
+                os.unlink(source)
+
+    def _open_capture(self):
+        """Read the upload from memory where OpenCV supports it, otherwise from a temporary file.
+
+        Returns the capture and its source; OpenCV does not keep the stream alive itself.
+        """
+        import cv2
+
+        try:
+            # Streams need an explicit backend; FFmpeg ships with the opencv-python wheels
+            stream = io.BytesIO(self.data)
+            capture = cv2.VideoCapture(stream, cv2.CAP_FFMPEG, [])
+            if capture.isOpened():
+                return capture, stream
+        except (TypeError, SystemError, cv2.error):
+            pass  # OpenCV before 4.10 only opens paths
+
+        with tempfile.NamedTemporaryFile(suffix='.' + self.header.format.lower(), delete=False) as f:
+            f.write(self.data)
+        capture = cv2.VideoCapture(f.name)
+        if not capture.isOpened():
+            os.unlink(f.name)
+            raise ImageRejected(415, "Video could not be decoded")
+        return capture, f.name
+
+
+class FeatureAggregator:
+    """Running summary of per-frame features, in constant memory"""
+
+    def __init__(self):
+        self.frames = 0
+        self._best = None  # Frame with the most faces; its faces and dominant colours are reported
+        self._glasses = 0
+        self._themes = Counter()
+        self._brightness = self._saturation = self._contrast = 0.0
+        self._hue = None
+
+    def add(self, features):
+        self.frames += 1
+        if self._best is None or features.faces.count > self._best.faces.count:
+            self._best = features
+        self._glasses += features.objects.glasses
+        self._themes[features.colors.theme] += 1
+        self._brightness += features.colors.brightness
+        self._saturation += features.colors.saturation
+        self._contrast += features.colors.contrast
+        histogram = features.colors.hue_histogram
+        self._hue = list(histogram) if self._hue is None else [a + b for a, b in zip(self._hue, histogram)]
+
+    def result(self):
+        """Features for the whole clip, or None before any frame was added"""
+        if self._best is None:
+            return None
+        n = self.frames
+        best = self._best
+        return PhotoFeatures(
+            faces=Faces(count=best.faces.count, features=best.faces.features),
+            # Glasses must show up in at least half the frames; single-frame detections are noisy
+            objects=Objects(glasses=self._glasses * 2 >= n, multiple_people=best.faces.count > 1),
+            colors=Colors(
+                theme=self._themes.most_common(1)[0][0],
+                brightness=self._brightness / n,
+                saturation=round(self._saturation / n, 3),
+                contrast=round(self._contrast / n, 3),
+                hue_histogram=[round(v / n, 3) for v in self._hue],
+                dominant_colors=best.colors.dominant_colors
+            ),
+            composition=Composition(
+                aspect_ratio=best.composition.aspect_ratio,
+                resolution=best.composition.resolution,
+                orientation=best.composition.orientation
+            )
+        )
+
+
+class ClipAnalyzer:
+    """Analyse animated images and short videos: sampled frames run on the analysis pool in parallel.
+
+    Frames are decoded on a small executor of its own, one thread per clip;
+    clips beyond max_decodes are refused like a full analysis pool.
+    """
+
+    def __init__(self, pool, max_frames=None, time_budget=None, scene_threshold=None, max_side=None, max_pixels=None,
+                 max_decodes=None):
+        self.pool = pool
+        self.max_frames = int(max_frames or os.getenv('CLIP_MAX_FRAMES', 8))
+        self.time_budget = float(time_budget or os.getenv('CLIP_TIME_BUDGET', 3.0))
+        # Mean absolute difference (0-255) between thumbnails that counts as a new scene
+        self.scene_threshold = float(scene_threshold or os.getenv('CLIP_SCENE_THRESHOLD', 30))
+        self.max_side = int(max_side if max_side is not None else os.getenv('ANALYZER_WORKING_SIZE', 1280))
+        self.max_pixels = int(max_pixels or os.getenv('MAX_IMAGE_PIXELS', 50_000_000))
+        self.max_decodes = int(max_decodes or os.getenv('CLIP_MAX_DECODES', pool.workers))
+        # Threads start on first use, so building this before run.py forks is safe
+        self.decoder = ThreadPoolExecutor(max_workers=self.max_decodes, thread_name_prefix='clip-decode')
+        self._decoding = 0  # Clips whose sampler is still open; only touched on the event loop
+
+    async def analyze(self, data, header):
+        """Return (features, clip summary); analysis stops at the time budget with what it has so far"""
+        if self._decoding >= self.max_decodes:
+            raise PoolSaturated(self.pool.retry_after)
+        deadline = time.monotonic() + self.time_budget
+        sampler = FrameSampler(data, header, self.max_frames, self.scene_threshold, self.max_side, self.max_pixels,
+                               deadline)
+        frames = iter(sampler)
+        self._decoding += 1
+        loop = asyncio.get_running_loop()
+        aggregator = FeatureAggregator()
+        slots = asyncio.Semaphore(self.pool.workers)  # Frames in flight, and so in memory, at once
+        pending = set()
+        saturated = None
+        partial = False
+
+        async def analyze_frame(frame, decode_ratio):
+            try:
+                return await self.pool.submit('analyze_frame', frame, decode_ratio)
+            finally:
+                slots.release()
+
+        def fold(task):
+            nonlocal saturated
+            error = task.exception()
+            if error is None:
+                aggregator.add(task.result())
+            elif isinstance(error, PoolSaturated):
+                saturated = error
+            # Any other failure just loses that frame
+
+        read = None
+        try:
+            while saturated is None:
+                remaining = deadline - time.monotonic()
+                try:
+                    await asyncio.wait_for(slots.acquire(), max(remaining, 0))
+                except asyncio.TimeoutError:
+                    partial = True
+                    break
+                read = loop.run_in_executor(self.decoder, next, frames, None)
+                try:
+                    item = await asyncio.wait_for(asyncio.shield(read), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    slots.release()
+                    partial = True
+                    break
+                read = None
+                if item is None:
+                    slots.release()
+                    break
+                pending.add(asyncio.ensure_future(analyze_frame(*item)))
+                for task in [task for task in pending if task.done()]:
+                    pending.discard(task)
+                    fold(task)
+
+            if pending:
+                done, pending = await asyncio.wait(pending, timeout=max(deadline - time.monotonic(), 0))
+                for task in done:
+                    fold(task)
+        finally:
+            # Frames still queued are dropped; a decode still running closes the clip when it finishes
+            for task in pending:
+                task.cancel()
+            partial = partial or bool(pending) or saturated is not None or sampler.truncated
+            if read is None:
+                self._close(frames)
+            else:
+                read.add_done_callback(lambda _: self._close(frames))
+
+        features = aggregator.result()
+        if features is None:
+            if saturated is not None:
+                raise saturated
+            raise ValueError("No frame of the clip could be analysed in time")
+        return features, {
+            'frames_seen': sampler.seen,
+            'frames_analyzed': aggregator.frames,
+            'duration': round(sampler.length or sampler.duration, 2),
+            'partial': partial
+        }
+
+    def _close(self, frames):
+        frames.close()
+        self._decoding -= 1
+
+    def shutdown(self):
+        self.decoder.shutdown(wait=False)
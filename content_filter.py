@@ -0,0 +1,98 @@
+import os
+import re
+from pathlib import Path
+
+from file_watch import WatchedFile
+from trie_regex import trie_pattern
+
+DEFAULT_WORDS_PATH = Path(__file__).parent / 'banned_words.txt'
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class ContentFilter:
+    """Single-pass, case-insensitive replacement of banned words from a reloadable list"""
+
+    def __init__(self, path=None, replacement="interesting", reload_interval=2.0):
+        self.path = Path(path or os.getenv('CONTENT_FILTER_PATH') or DEFAULT_WORDS_PATH)
+        self.replacement = replacement
+        self.reload_interval = reload_interval
+
+        self._compiled = (None, 0)  # (pattern, longest term); swapped as one unit on reload
+        self._watch = WatchedFile(self.path, self._load, reload_interval)
+        self._watch.reload()
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            words = {line.strip().lower() for line in f if line.strip() and not line.startswith('#')}
+
+        pattern = re.compile(r'\b' + trie_pattern(words) + r'\b', re.IGNORECASE) if words else None
+        self._compiled = (pattern, max(map(len, words), default=0))
+
+    def _current(self):
+        """Compiled pattern, re-reading the word list if the file changed"""
+        self._watch.poll()
+        return self._compiled
+
+    def _replace(self, match):
+        word = match.group(0)
+        if word.isupper() and len(word) > 1:
+            return self.replacement.upper()
+        if word[0].isupper():
+            return self.replacement[:1].upper() + self.replacement[1:]
+        return self.replacement
+
+    def filter(self, text):
+        """Replace every banned word in one linear pass"""
+        pattern, _ = self._current()
+        return pattern.sub(self._replace, text) if pattern and text else text
+
+    def stream(self):
+        """Incremental filter for text that arrives in chunks"""
+        return StreamFilter(self)
+
+
+class StreamFilter:
+    """Filters streamed chunks, holding back only text a banned term could still span"""
+
+    def __init__(self, content_filter):
+        self.content_filter = content_filter
+        self._pending = ""
+
+    def feed(self, chunk):
+        """Return the filtered text that is safe to emit"""
+        self._pending += chunk
+        pattern, longest = self.content_filter._current()
+        if pattern is None:
+            ready, self._pending = self._pending, ""
+            return ready
+
+        # Anything in the last `longest` characters may still grow into a term;
+        # back off further so a word is never split
+        cut = len(self._pending) - longest
+        while cut > 0 and _is_word_char(self._pending[cut - 1]):
+            cut -= 1
+        if cut <= 0:
+            return ""
+
+        # Matches are found on the whole buffer so a term straddling the cut is
+        # replaced whole; it is fully visible because it starts before the cut
+        out, pos = [], 0
+        for match in pattern.finditer(self._pending):
+            if match.start() >= cut:
+                break
+            out.append(self._pending[pos:match.start()])
+            out.append(self.content_filter._replace(match))
+            pos = match.end()
+        cut = max(cut, pos)
+        out.append(self._pending[pos:cut])
+
+        self._pending = self._pending[cut:]
+        return "".join(out)
+
+    def flush(self):
+        """Filter and return whatever is still held back at end of stream"""
+        ready, self._pending = self._pending, ""
+        return self.content_filter.filter(ready)
@@ -0,0 +1,37 @@
+import threading
+import time
+from pathlib import Path
+
+
+class WatchedFile:
+    """Calls a loader again when a file's mtime changes, checking at most once per interval"""
+
+    def __init__(self, path, load, interval=2.0):
+        self.path = Path(path)
+        self.load = load
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = time.monotonic()
+
+    def reload(self):
+        """Load the file now; errors propagate to the caller"""
+        mtime = self.path.stat().st_mtime
+        self.load()
+        self._mtime = mtime
+
+    def poll(self):
+        """Reload if the interval has passed and the file changed on disk"""
+        now = time.monotonic()
+        if now - self._checked_at < self.interval:
+            return
+        with self._lock:
+            if now - self._checked_at < self.interval:
+                return
+            self._checked_at = now
+            try:
+                if self.path.stat().st_mtime != self._mtime:
+                    self.reload()
+            except (OSError, ValueError):
+                pass  # Keep the last good version while the file is being edited
@@ -1,14 +1,51 @@
 import cv2
-from PIL import Image
+import io
 import numpy as np
 import os
+import time
+
+from image_guard import ImageRejected, read_header
+from photo_features import Colors, Composition, DominantColor, Face, Faces, Objects, PhotoFeatures
+
+# Colour analysis runs on a strided sample about this many pixels on a side,
+# which keeps its cost fixed regardless of the input resolution
+COLOR_SAMPLE_SIDE = 64
+HUE_BINS = 12
+DOMINANT_COLORS = 3
+KMEANS_ITERATIONS = 8
+
+# Colour themes, checked in order against the mean colour; the first match wins
+THEME_RULES = (
+    ('bright', lambda r, g, b, brightness: brightness > 200),
+    ('dark', lambda r, g, b, brightness: brightness < 50),
+    ('red', lambda r, g, b, brightness: r > g + 30 and r > b + 30),
+    ('green', lambda r, g, b, brightness: g > r + 30 and g > b + 30),
+    ('blue', lambda r, g, b, brightness: b > r + 30 and b > g + 30),
+)
 
 class ImageAnalyzer:
-    def __init__(self):
+    def __init__(self, working_size=None, confirm_faces=None):
+        # Longest side (px) faces are detected at; 0 analyses at full resolution
+        if working_size is None:
+            working_size = int(os.getenv('ANALYZER_WORKING_SIZE', 1280))
+        if confirm_faces is None:
+            confirm_faces = os.getenv('ANALYZER_CONFIRM_FACES', '').lower() in ('1', 'true', 'yes')
+        self.working_size = working_size
+        self.confirm_faces = confirm_faces
+        
         face_cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
         self.face_cascade = cv2.CascadeClassifier(face_cascade_path)
         if self.face_cascade.empty():
             raise RuntimeError(f"Could not load face cascade from {face_cascade_path}")
+        
+        # Loaded once here rather than on every analysis
+        eye_cascade_path = cv2.data.haarcascades + 'haarcascade_eye.xml'
+        self.eye_cascade = cv2.CascadeClassifier(eye_cascade_path)
+        if self.eye_cascade.empty():
+            self.eye_cascade = None  # Glasses detection is skipped without it
+        
+        # Seconds spent in each stage of the last call; read by the analysis pool for metrics
+        self.timings = {}
     
     def analyze_photo(self, image_path):
         """Analyze photo and extract roastable features"""
@@ -19,86 +56,239 @@ class ImageAnalyzer:
         if image is None:
             raise ValueError(f"Could not load image: {image_path}")
         
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return self._analyze_image(image)
+    
+    def analyze_bytes(self, data, header=None, fingerprint=False):
+        """Analyze an encoded image held in memory (bytes, buffer or file object).
+        
+        With fingerprint=True, returns (features, 64-bit dHash) for near-duplicate
+        lookup; the hash comes from the same decoded frame as the features.
+        """
+        if hasattr(data, 'read'):
+            data = data.read()
+        buffer = self._buffer(data)
         
-        features = {
-            'faces': self._detect_faces(image),
-            'objects': self._detect_objects(image),
-            'colors': self._analyze_colors(rgb_image),
-            'composition': self._analyze_composition(image)
-        }
+        if header is None:
+            try:
+                header = read_header(data)
+            except ImageRejected:
+                header = None  # Let OpenCV have a go at the full decode
         
-        return features
+        started = time.perf_counter()
+        if header is not None and header.format == 'GIF':
+            image = self._decode_gif(data)  # OpenCV only reads GIF from 4.11 on
+        else:
+            image = cv2.imdecode(buffer, self._decode_flag(header))
+        if image is None:
+            raise ValueError("Could not decode image data")
+        self.timings['decode'] = time.perf_counter() - started
+        
+        # How much smaller the decoded frame is than the original (longest sides, so EXIF rotation is harmless)
+        decode_ratio = max(image.shape[:2]) / max(header.width, header.height) if header else 1.0
+        return self._analyze_image(image, decode_ratio, fingerprint)
+    
+    def analyze_frame(self, frame, decode_ratio=1.0):
+        """Analyze one decoded BGR frame of a clip; decode_ratio is its size relative to the original"""
+        return self._analyze_image(frame, decode_ratio)
+    
+    def _decode_flag(self, header):
+        """Decode JPEGs at a reduced size when that still covers the working resolution"""
+        if header is None or header.format != 'JPEG' or not self.working_size:
+            return cv2.IMREAD_COLOR
+        
+        longest = max(header.width, header.height)
+        target = self.working_size * (2 if self.confirm_faces else 1)
+        for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+            if longest / factor >= target:
+                return flag
+        return cv2.IMREAD_COLOR
+    
+    def _decode_gif(self, data):
+        """First frame of a GIF as a BGR array, through PIL"""
+        from PIL import Image
+        
+        with Image.open(io.BytesIO(data)) as image:
+            return np.ascontiguousarray(np.asarray(image.convert('RGB'))[:, :, ::-1])
+    
+    def _buffer(self, data):
+        if hasattr(data, 'read'):
+            data = data.read()
+        
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        if buffer.size == 0:
+            raise ValueError("Image data is empty")
+        return buffer
     
-    def _detect_faces(self, image):
-        """Detect faces and analyze facial features"""
+    def _dhash(self, gray):
+        """Difference hash: one bit per horizontally adjacent pair on a 9x8 thumbnail"""
+        thumb = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+        bits = (thumb[:, 1:] > thumb[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+    
+    def _analyze_image(self, image, decode_ratio=1.0, fingerprint=False):
+        """Extract roastable features from a decoded BGR image, and its dHash with fingerprint=True"""
+        last = [time.perf_counter()]
+        
+        def lap(stage):
+            now = time.perf_counter()
+            self.timings[stage] = now - last[0]
+            last[0] = now
+        
+        # One grayscale conversion and one face pass feed every detector
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+        small, scale = self._working_frame(gray)
+        small_faces = self.face_cascade.detectMultiScale(small, 1.1, 4)
+        if self.confirm_faces and scale < 1:
+            small_faces = self._confirm_faces(gray, small_faces, scale)
+        faces = self._to_original(small_faces, scale * decode_ratio)
+        face_features = self._detect_faces(faces)
+        lap('detect_faces')
+        
+        objects = self._detect_objects(small, small_faces)
+        lap('detect_objects')
+        
+        colors = self._analyze_colors(image)
+        lap('analyze_colors')
         
+        composition = self._analyze_composition(image, decode_ratio)
+        lap('analyze_composition')
+        
+        features = PhotoFeatures(faces=face_features, objects=objects, colors=colors, composition=composition)
+        if not fingerprint:
+            return features
+        
+        # The working frame is plenty for a 9x8 hash
+        fingerprint = self._dhash(small)
+        lap('fingerprint')
+        return features, fingerprint
+    
+    def _working_frame(self, gray):
+        """Downscale the frame to the working resolution, returning it and the scale used"""
+        h, w = gray.shape[:2]
+        longest = max(h, w)
+        if not self.working_size or longest <= self.working_size:
+            return gray, 1.0
+        
+        scale = self.working_size / longest
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+    
+    def _to_original(self, faces, scale):
+        """Map face boxes from working-frame coordinates back to the original image"""
+        if scale == 1 or len(faces) == 0:
+            return faces
+        return np.round(np.asarray(faces) / scale).astype(int)
+    
+    def _confirm_faces(self, gray, small_faces, scale):
+        """Re-check each coarse detection on a finer pyramid level of the original frame"""
+        confirmed = []
+        fine_scale = min(1.0, scale * 2)
+        for (x, y, w, h) in small_faces:
+            # Crop the box plus a margin from the full frame, then resample to the finer level
+            mx, my = w // 4, h // 4
+            x0 = max(0, int((x - mx) / scale))
+            y0 = max(0, int((y - my) / scale))
+            x1 = min(gray.shape[1], int((x + w + mx) / scale))
+            y1 = min(gray.shape[0], int((y + h + my) / scale))
+            region = gray[y0:y1, x0:x1]
+            if region.size == 0:
+                continue
+            
+            size = (max(1, round(region.shape[1] * fine_scale)), max(1, round(region.shape[0] * fine_scale)))
+            region = cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+            if len(self.face_cascade.detectMultiScale(region, 1.1, 4)) > 0:
+                confirmed.append((x, y, w, h))
+        
+        return np.array(confirmed, dtype=int).reshape(-1, 4)
+    
+    def _detect_faces(self, faces):
+        """Analyze facial features of the detected face boxes"""
         face_features = []
         for (x, y, w, h) in faces:
-            features = {
-                'width': w,
-                'height': h,
-                'ratio': w / h if h > 0 else 1,
-                'size': 'large' if w > 200 else 'small' if w < 100 else 'medium'
-            }
-            face_features.append(features)
+            # Plain ints: detector boxes are numpy values, which pickle bigger and serialize slower
+            w, h = int(w), int(h)
+            face_features.append(Face(
+                width=w,
+                height=h,
+                ratio=w / h if h > 0 else 1.0,
+                size='large' if w > 200 else 'small' if w < 100 else 'medium'
+            ))
         
-        return {'count': len(faces), 'features': face_features}
+        return Faces(count=len(faces), features=face_features)
     
-    def _detect_objects(self, image):
+    def _detect_objects(self, gray, faces):
         """Simple object detection for common roastable items"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Eyes are only searched for inside face regions
+        eye_count = 0
+        if self.eye_cascade is not None:
+            for (x, y, w, h) in faces:
+                roi = gray[y:y + h, x:x + w]
+                eye_count += len(self.eye_cascade.detectMultiScale(roi, 1.1, 3))
         
-        # Detect eyes and faces for object inference
-        eye_cascade_path = cv2.data.haarcascades + 'haarcascade_eye.xml'
-        eye_cascade = cv2.CascadeClassifier(eye_cascade_path)
-        if eye_cascade.empty():
-            eyes = []  # Fallback if eye cascade fails
-        else:
-            eyes = eye_cascade.detectMultiScale(gray, 1.1, 3)
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+        return Objects(
+            glasses=eye_count > len(faces) * 2,  # More eyes than expected might indicate glasses
+            multiple_people=len(faces) > 1
+        )
+    
+    def _analyze_colors(self, image):
+        """Analyze dominant colors in the image"""
+        # Sample pixels for efficiency; only the sample is ever colour-converted
+        h, w = image.shape[:2]
+        step = max(1, max(h, w) // COLOR_SAMPLE_SIDE)
+        sample = np.ascontiguousarray(image[::step, ::step])
+        pixels = sample.reshape(-1, 3)[:, ::-1].astype(np.float32)  # BGR -> RGB
         
-        objects = {
-            'glasses': len(eyes) > len(faces) * 2,  # More eyes than expected might indicate glasses
-            'multiple_people': len(faces) > 1
-        }
+        r, g, b = (float(c) for c in pixels.mean(axis=0))
+        brightness = (r + g + b) / 3
+        color_theme = next((theme for theme, rule in THEME_RULES if rule(r, g, b, brightness)), 'mixed')
         
-        return objects
+        hsv = cv2.cvtColor(sample, cv2.COLOR_BGR2HSV).reshape(-1, 3)
+        saturation = hsv[:, 1].astype(np.float32) / 255
+        value = hsv[:, 2].astype(np.float32) / 255
+        
+        # Hue histogram over chromatic pixels only; greys have no meaningful hue
+        chromatic = (hsv[:, 1] >= 32) & (hsv[:, 2] >= 32)
+        hue_bins = hsv[chromatic, 0].astype(np.int32) * HUE_BINS // 180
+        hue_histogram = np.bincount(hue_bins, minlength=HUE_BINS) / len(hsv)
+        
+        return Colors(
+            theme=color_theme,
+            brightness=brightness,
+            saturation=round(float(saturation.mean()), 3),
+            contrast=round(float(value.std()), 3),
+            hue_histogram=[round(float(v), 3) for v in hue_histogram],
+            dominant_colors=self._dominant_colors(pixels)
+        )
     
-    def _analyze_colors(self, rgb_image):
-        """Analyze dominant colors in the image"""
-        # Sample pixels for efficiency
-        h, w = rgb_image.shape[:2]
-        sample = rgb_image[::max(1, h//100), ::max(1, w//100)]
-        dominant_color = np.mean(sample.reshape(-1, 3), axis=0)
-        
-        # Categorize colors
-        r, g, b = dominant_color
-        brightness = np.mean(dominant_color)
-        
-        if brightness > 200:
-            color_theme = 'bright'
-        elif brightness < 50:
-            color_theme = 'dark'
-        elif r > g + 30 and r > b + 30:
-            color_theme = 'red'
-        elif g > r + 30 and g > b + 30:
-            color_theme = 'green'
-        elif b > r + 30 and b > g + 30:
-            color_theme = 'blue'
-        else:
-            color_theme = 'mixed'
+    def _dominant_colors(self, pixels):
+        """k-means over the sampled pixels with a fixed iteration count"""
+        k = min(DOMINANT_COLORS, len(pixels))
+        # Deterministic start: centres spread evenly across the pixels sorted by luminance
+        order = np.argsort(pixels.sum(axis=1))
+        centers = pixels[order[np.linspace(0, len(order) - 1, k).astype(int)]].copy()
+        
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2; |p|^2 is the same for every centre, so it is dropped
+        for _ in range(KMEANS_ITERATIONS):
+            labels = ((centers ** 2).sum(axis=1) - 2 * pixels @ centers.T).argmin(axis=1)
+            counts = np.bincount(labels, minlength=k)
+            one_hot = np.zeros((k, len(pixels)), dtype=np.float32)
+            one_hot[labels, np.arange(len(pixels))] = 1
+            filled = counts > 0
+            centers[filled] = (one_hot @ pixels)[filled] / counts[filled, None]
         
-        return {'theme': color_theme, 'brightness': float(brightness)}
+        shares = counts / len(pixels)
+        return [
+            DominantColor(rgb=[int(round(c)) for c in centers[i]], share=round(float(shares[i]), 3))
+            for i in np.argsort(-shares) if counts[i] > 0
+        ]
     
-    def _analyze_composition(self, image):
+    def _analyze_composition(self, image, decode_ratio=1.0):
         """Analyze image composition for roasting material"""
-        height, width = image.shape[:2]
+        # Report the original dimensions even if the frame was decoded at reduced size
+        height, width = (round(side / decode_ratio) for side in image.shape[:2])
         
-        return {
-            'aspect_ratio': width / height,
-            'resolution': 'low' if width < 500 else 'high',
-            'orientation': 'landscape' if width > height else 'portrait'
-        }
\ No newline at end of file
+        return Composition(
+            aspect_ratio=width / height,
+            resolution='low' if width < 500 else 'high',
+            orientation='landscape' if width > height else 'portrait'
+        )
\ No newline at end of file
@@ -0,0 +1,66 @@
+import io
+import os
+from collections import namedtuple
+
+# `animated` uploads are analysed frame by frame; videos report 0x0 until they are opened
+ImageHeader = namedtuple('ImageHeader', 'format width height animated', defaults=(False,))
+
+# Formats OpenCV can decode; anything else is refused before decoding
+SUPPORTED_FORMATS = frozenset({'JPEG', 'PNG', 'WEBP', 'BMP', 'TIFF', 'GIF'})
+# Video containers read through cv2.VideoCapture, recognised by (offset, signature)
+VIDEO_SIGNATURES = (
+    ('MP4', 4, b'ftyp'),  # ISO base media: MP4, MOV, M4V
+    ('WEBM', 0, b'\x1a\x45\xdf\xa3'),  # Matroska / WebM
+)
+VIDEO_FORMATS = frozenset(name for name, _, _ in VIDEO_SIGNATURES)
+
+
+class ImageRejected(ValueError):
+    """An upload refused before decoding, with the HTTP status to report"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def read_header(data):
+    """Format and dimensions from the image header only; no pixel data is decoded"""
+    for name, offset, signature in VIDEO_SIGNATURES:
+        if data[offset:offset + len(signature)] == signature:
+            return ImageHeader(name, 0, 0, True)
+
+    from PIL import Image  # Deferred so importing the API stays fast
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format == 'MPO':
+                # A JPEG whose MPF segment adds images (depth maps, HDR previews); OpenCV decodes the primary one
+                return ImageHeader('JPEG', image.width, image.height, False)
+            # is_animated only looks for a second frame; GIF, WebP and PNG can all be animated
+            return ImageHeader(image.format, image.width, image.height, getattr(image, 'is_animated', False))
+    except Image.DecompressionBombError:
+        raise ImageRejected(413, "Image dimensions are too large")
+    except Exception:
+        raise ImageRejected(415, "File is not a supported image")
+
+
+class ImageGuard:
+    """Byte, pixel and format limits checked before any full decode"""
+
+    def __init__(self, max_bytes=None, max_pixels=None, formats=SUPPORTED_FORMATS | VIDEO_FORMATS):
+        self.max_bytes = int(max_bytes or os.getenv('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
+        self.max_pixels = int(max_pixels or os.getenv('MAX_IMAGE_PIXELS', 50_000_000))
+        self.formats = formats
+
+    def check(self, data):
+        """Validate an upload's real format and size, returning its header"""
+        if len(data) > self.max_bytes:
+            raise ImageRejected(413, f"Image is larger than {self.max_bytes} bytes")
+
+        header = read_header(data)
+        if header.format not in self.formats:
+            raise ImageRejected(415, f"Unsupported image format: {header.format}")
+        if header.width * header.height > self.max_pixels:
+            raise ImageRejected(413, f"Image has more than {self.max_pixels} pixels")
+        return header
@@ -0,0 +1,55 @@
+import json
+import re
+from pathlib import Path
+
+from trie_regex import trie_pattern
+
+DEFAULT_INTENTS_PATH = Path(__file__).parent / 'chat_intents.json'
+
+
+class IntentMatcher:
+    """Classify a chat message with one lowercase pass and one compiled regex"""
+
+    def __init__(self, intents):
+        self.intents = intents
+        self._priority = {}  # matched text -> index of the first intent that owns it
+        keywords, symbols = set(), set()
+        for index, intent in enumerate(intents):
+            for keyword in intent.get('keywords', []):
+                keyword = keyword.lower()
+                self._priority.setdefault(keyword, index)
+                keywords.add(keyword)
+            for symbol in intent.get('symbols', []):
+                self._priority.setdefault(symbol, index)
+                symbols.add(symbol)
+
+        parts = []
+        if keywords:
+            parts.append(r'\b' + trie_pattern(keywords) + r'\b')
+        if symbols:
+            parts.append(trie_pattern(symbols))
+        self._pattern = re.compile('|'.join(parts)) if parts else None
+
+    @classmethod
+    def from_file(cls, path=None):
+        with open(path or DEFAULT_INTENTS_PATH, encoding='utf-8') as f:
+            return cls(json.load(f)['intents'])
+
+    def classify(self, message):
+        """Return the highest-priority intent in the message, or None"""
+        if self._pattern is None:
+            return None
+
+        best = None
+        for match in self._pattern.finditer(message.lower()):
+            index = self._priority[match.group(0)]
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.intents[best] if best is not None else None
+
+    def respond(self, message):
+        """Canned response for the message's intent, or None to fall through"""
+        intent = self.classify(message)
+        return intent['response'] if intent else None
@@ -0,0 +1,40 @@
+import dataclasses
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # The standard library encoder is used instead, several times slower
+
+
+def _default(value):
+    """Encode what the standard library cannot: records and numpy scalars or arrays"""
+    if dataclasses.is_dataclass(value):
+        return {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def dumps(value, sort_keys=False):
+    """Compact UTF-8 JSON bytes for API payloads, feature records and numpy values included"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(value, default=_default, option=option)
+    return json.dumps(value, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that serializes records and numpy values itself.
+
+    Endpoints return it directly: FastAPI runs jsonable_encoder over anything
+    else first, which is slow and cannot handle numpy integers.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,233 @@
+"""
+Minimal Prometheus-style metrics.
+
+Metric objects and their label children are created once at import time,
+so recording on the hot path is a dict lookup plus an increment. Counters
+use itertools.count, whose next() is atomic under the GIL, so they need no
+lock; histograms take a short uncontended lock per observation.
+"""
+
+import bisect
+import itertools
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _CounterChild:
+    __slots__ = ('_count',)
+
+    def __init__(self):
+        self._count = itertools.count()
+
+    def inc(self):
+        next(self._count)
+
+    @property
+    def value(self):
+        # repr(count(7)) == 'count(7)'; reading never blocks writers
+        return int(repr(self._count)[6:-1])
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_buckets', '_sum', '_lock')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._buckets = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._buckets[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Context manager observing the elapsed wall time of its block"""
+        return _Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._buckets), self._sum
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._child_for(())
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _child_for(self, values):
+        child = self._children.get(values)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def labels(self, *values):
+        return self._child_for(tuple(str(v) for v in values))
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self):
+        self._default.inc()
+
+    def render(self):
+        lines = self.header()
+        for values, child in list(self._children.items()):
+            lines.append(f'{self.name}_total{_format_labels(self.labelnames, values)} {child.value}')
+        return lines
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def render(self):
+        lines = self.header()
+        for values, child in list(self._children.items()):
+            buckets, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), buckets):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class GaugeCallback(_Metric):
+    """Gauge read from a callback at scrape time, e.g. a component's stats()"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback, labelnames=(), registry=None):
+        self.callback = callback  # returns [(label_values, value), ...]
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return None
+
+    def render(self):
+        lines = self.header()
+        for values, value in self.callback():
+            lines.append(f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram(
+    'roast_stage_seconds',
+    'Time spent in each stage of handling a photo.',
+    labelnames=('stage',)
+)
+LLM_REQUESTS = Counter(
+    'roast_llm_requests',
+    'LLM requests by kind and outcome (ok, timeout, busy, error).',
+    labelnames=('kind', 'outcome')
+)
+FALLBACKS = Counter(
+    'roast_fallbacks',
+    'Canned or template lines served instead of an LLM reply.',
+    labelnames=('kind',)
+)
+ENDPOINT_ERRORS = Counter(
+    'roast_endpoint_errors',
+    'Unexpected errors an endpoint swallowed and answered with a canned response.',
+    labelnames=('endpoint',)
+)
+
+# Pre-create the children used on the hot path so recording never allocates
+STAGES = (
+    'upload', 'sniff', 'pool_wait', 'decode', 'fingerprint', 'detect_faces',
+    'detect_objects', 'analyze_colors', 'analyze_composition', 'llm'
+)
+for _stage in STAGES:
+    STAGE_SECONDS.labels(_stage)
+for _kind in ('roast', 'comeback', 'batch', 'pool', 'standup', 'chat'):
+    for _outcome in ('ok', 'timeout', 'busy', 'error'):
+        LLM_REQUESTS.labels(_kind, _outcome)
+for _kind in ('roast', 'comeback', 'standup', 'chat'):
+    FALLBACKS.labels(_kind)
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+
+from photo_features import as_features
+
+HASH_BITS = 64
+# Bits a hash must have both set and clear; flat or low-texture images hash to
+# (nearly) all zeros or all ones whatever their colours, so they match nothing
+MIN_TEXTURE_BITS = 4
+# How far statistics the hash ignores may drift between a photo and a recompressed or resized copy
+MAX_ASPECT_DRIFT = 0.02  # Relative
+MAX_MEAN_DRIFT = 12.0  # Per RGB channel, 0-255
+MAX_HUE_DRIFT = 0.25  # L1 distance between hue histograms
+
+
+def is_degenerate(value):
+    """Whether a dHash has too little texture to identify a photo"""
+    ones = bin(value).count('1')
+    return min(ones, HASH_BITS - ones) < MIN_TEXTURE_BITS
+
+
+def _mean_rgb(colors):
+    total = sum(color.share for color in colors.dominant_colors) or 1.0
+    return [sum(color.rgb[i] * color.share for color in colors.dominant_colors) / total for i in range(3)]
+
+
+def same_photo(features, original):
+    """Confirm a hash match on what the hash cannot see: shape, mean colour and hue spread"""
+    a, b = as_features(features), as_features(original)
+    if abs(a.composition.aspect_ratio / b.composition.aspect_ratio - 1) > MAX_ASPECT_DRIFT:
+        return False
+    if abs(a.colors.brightness - b.colors.brightness) > MAX_MEAN_DRIFT:
+        return False
+    if any(abs(x - y) > MAX_MEAN_DRIFT for x, y in zip(_mean_rgb(a.colors), _mean_rgb(b.colors))):
+        return False
+    hue_drift = sum(abs(x - y) for x, y in zip(a.colors.hue_histogram, b.colors.hue_histogram))
+    return hue_drift <= MAX_HUE_DRIFT
+
+
+class NearDuplicateIndex:
+    """Bounded in-memory index of perceptual hashes, searchable by Hamming distance.
+
+    Uses multi-index hashing: each hash is split into max_distance + 1 bit
+    bands and indexed per band. Two hashes within max_distance bits of each
+    other must agree exactly on at least one band, so a lookup only compares
+    against the few hashes that share a band instead of scanning them all.
+    """
+
+    def __init__(self, max_distance=None, max_entries=None):
+        self.max_distance = int(max_distance if max_distance is not None else os.getenv('NEAR_DUPLICATE_DISTANCE', 4))
+        self.max_entries = int(max_entries or os.getenv('NEAR_DUPLICATE_MAX_ENTRIES', 50000))
+
+        bands = self.max_distance + 1
+        edges = [HASH_BITS * i // bands for i in range(bands + 1)]
+        self._bands = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self._tables = [{} for _ in self._bands]  # band value -> set of hashes
+        self._entries = OrderedDict()  # hash -> key, in LRU order
+
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _band_values(self, value):
+        return [(value >> shift) & mask for shift, mask in self._bands]
+
+    def find(self, value):
+        """Key of the closest stored hash within max_distance, or None; degenerate hashes match nothing"""
+        with self._lock:
+            self.lookups += 1
+            if is_degenerate(value):
+                return None
+            best, best_distance = None, self.max_distance + 1
+            for table, band in zip(self._tables, self._band_values(value)):
+                for candidate in table.get(band, ()):
+                    distance = bin(candidate ^ value).count('1')
+                    if distance < best_distance:
+                        best, best_distance = candidate, distance
+            if best is None:
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def add(self, value, key):
+        if is_degenerate(value):
+            return
+        with self._lock:
+            if value in self._entries:
+                self._entries[value] = key
+                self._entries.move_to_end(value)
+                return
+            self._entries[value] = key
+            for table, band in zip(self._tables, self._band_values(value)):
+                table.setdefault(band, set()).add(value)
+
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                for table, band in zip(self._tables, self._band_values(evicted)):
+                    bucket = table[band]
+                    bucket.discard(evicted)
+                    if not bucket:
+                        del table[band]
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'max_distance': self.max_distance,
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from typing import List, Optional
+
+# Value orders used to pack the coarse signals into PhotoFeatures.bucket; unknown values map to 0
+FACE_SIZES = ('small', 'medium', 'large')
+THEMES = (None, 'bright', 'dark', 'red', 'green', 'blue', 'mixed')
+RESOLUTIONS = (None, 'low', 'high')
+
+
+# Records mirror the JSON shape the API has always returned, field for field, so
+# serializers emit them directly. dataclass(slots=True) needs Python 3.10 and the
+# app supports 3.9 (see Requirements in the README), hence the explicit __slots__.
+
+@dataclass
+class Face:
+    __slots__ = ('width', 'height', 'ratio', 'size')
+    width: int
+    height: int
+    ratio: float
+    size: str
+
+
+@dataclass
+class Faces:
+    __slots__ = ('count', 'features')
+    count: int
+    features: List[Face]
+
+
+@dataclass
+class Objects:
+    __slots__ = ('glasses', 'multiple_people')
+    glasses: bool
+    multiple_people: bool
+
+
+@dataclass
+class DominantColor:
+    __slots__ = ('rgb', 'share')
+    rgb: List[int]
+    share: float
+
+
+@dataclass
+class Colors:
+    __slots__ = ('theme', 'brightness', 'saturation', 'contrast', 'hue_histogram', 'dominant_colors')
+    theme: Optional[str]
+    brightness: float
+    saturation: float
+    contrast: float
+    hue_histogram: List[float]
+    dominant_colors: List[DominantColor]
+
+
+@dataclass
+class Composition:
+    __slots__ = ('aspect_ratio', 'resolution', 'orientation')
+    aspect_ratio: float
+    resolution: Optional[str]
+    orientation: Optional[str]
+
+
+@dataclass
+class PhotoFeatures:
+    """Everything ImageAnalyzer extracts from a photo, plus its coarse bucket"""
+    __slots__ = ('faces', 'objects', 'colors', 'composition', 'bucket')
+    faces: Faces
+    objects: Objects
+    colors: Colors
+    composition: Composition
+
+    def __post_init__(self):
+        # Not a dataclass field, so it never appears in responses
+        self.bucket = bucket_of(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a record from its JSON form; missing or malformed parts get neutral defaults"""
+        data = data if isinstance(data, dict) else {}
+        faces = _section(data, 'faces')
+        objects = _section(data, 'objects')
+        colors = _section(data, 'colors')
+        composition = _section(data, 'composition')
+        return cls(
+            faces=Faces(
+                count=int(faces.get('count') or 0),
+                features=[
+                    Face(
+                        width=int(face.get('width') or 0),
+                        height=int(face.get('height') or 0),
+                        ratio=float(face.get('ratio') or 1),
+                        size=face.get('size')
+                    )
+                    for face in faces.get('features') or [] if isinstance(face, dict)
+                ]
+            ),
+            objects=Objects(
+                glasses=bool(objects.get('glasses')),
+                multiple_people=bool(objects.get('multiple_people'))
+            ),
+            colors=Colors(
+                theme=colors.get('theme'),
+                brightness=float(colors.get('brightness') or 0),
+                saturation=float(colors.get('saturation') or 0),
+                contrast=float(colors.get('contrast') or 0),
+                hue_histogram=[float(v) for v in colors.get('hue_histogram') or []],
+                dominant_colors=[
+                    DominantColor(rgb=[int(c) for c in color.get('rgb') or []], share=float(color.get('share') or 0))
+                    for color in colors.get('dominant_colors') or [] if isinstance(color, dict)
+                ]
+            ),
+            composition=Composition(
+                aspect_ratio=float(composition.get('aspect_ratio') or 1),
+                resolution=composition.get('resolution'),
+                orientation=composition.get('orientation')
+            )
+        )
+
+    @classmethod
+    def from_bucket(cls, bucket):
+        """The plainest photo in a bucket: just the signals the bucket records"""
+        count, sizes, theme, resolution, glasses, multiple = unpack_bucket(bucket)
+        faces = [Face(width=0, height=0, ratio=1.0, size=size) for size in sizes]
+        faces.extend(faces[-1:] * (count - len(faces)))
+        return cls(
+            faces=Faces(count=count, features=faces),
+            objects=Objects(glasses=glasses, multiple_people=multiple),
+            colors=Colors(theme=theme, brightness=0.0, saturation=0.0, contrast=0.0, hue_histogram=[], dominant_colors=[]),
+            composition=Composition(aspect_ratio=1.0, resolution=resolution, orientation=None)
+        )
+
+
+def _section(data, name):
+    value = data.get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def _index(values, value):
+    return values.index(value) if value in values else 0
+
+
+def bucket_of(features):
+    """Pack face count (0, 1, 2+), face sizes present, theme, resolution, glasses and
+    multiple people into one small int, for cache keys and template lookups"""
+    sizes = 0
+    for face in features.faces.features:
+        if face.size in FACE_SIZES:
+            sizes |= 1 << FACE_SIZES.index(face.size)
+    return (
+        min(features.faces.count, 2)
+        | sizes << 2
+        | _index(THEMES, features.colors.theme) << 5
+        | _index(RESOLUTIONS, features.composition.resolution) << 8
+        | features.objects.glasses << 10
+        | features.objects.multiple_people << 11
+    )
+
+
+def unpack_bucket(bucket):
+    """(count, sizes, theme, resolution, glasses, multiple_people) packed by bucket_of"""
+    return (
+        bucket & 3,
+        [size for i, size in enumerate(FACE_SIZES) if bucket >> (2 + i) & 1],
+        THEMES[bucket >> 5 & 7] if bucket >> 5 & 7 < len(THEMES) else None,
+        RESOLUTIONS[bucket >> 8 & 3] if bucket >> 8 & 3 < len(RESOLUTIONS) else None,
+        bool(bucket >> 10 & 1),
+        bool(bucket >> 11 & 1)
+    )
+
+
+def as_features(value):
+    """A PhotoFeatures record from a record, or from the dict form clients and old caches hold"""
+    return value if isinstance(value, PhotoFeatures) else PhotoFeatures.from_dict(value)
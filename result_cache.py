@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from photo_features import as_features
+
+# Seconds a SQLite statement waits on another process's lock before giving up; never on the event loop
+DISK_BUSY_TIMEOUT = 5.0
+# Most rows written per SQLite transaction, and rows written between trims to max_disk_entries
+WRITE_BATCH = 256
+TRIM_EVERY = 100
+# What unpickling a damaged or outdated row can raise
+UNREADABLE_ENTRY_ERRORS = (pickle.UnpicklingError, AttributeError, ImportError, EOFError, IndexError,
+                           TypeError, ValueError)
+
+
+def content_key(data):
+    """Stable key for a blob of image bytes"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def features_key(features):
+    """Stable key for an analysis result, whether it came from the analyzer or a JSON round trip"""
+    # A record's repr lists every field in a fixed order, which is all a key needs
+    return content_key(repr(as_features(features)).encode('utf-8'))
+
+
+class ResultCache:
+    """Byte-bounded in-process LRU with an optional SQLite tier that survives restarts.
+
+    The SQLite tier is best-effort and never touches the event loop: async
+    code reads it through get_async, and writes are batched by a background
+    thread. A locked or broken database file only costs cache hits.
+    """
+
+    def __init__(self, name, max_bytes=None, path=None, max_disk_entries=None, max_pending_writes=None):
+        self.name = name
+        self.max_bytes = int(max_bytes if max_bytes is not None else os.getenv('RESULT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        self.path = path if path is not None else os.getenv('RESULT_CACHE_PATH')
+        self.max_disk_entries = int(max_disk_entries or os.getenv('RESULT_CACHE_DISK_MAX_ENTRIES', 100000))
+        # Writes waiting for the writer thread; more are dropped rather than queued without bound
+        self.max_pending_writes = int(max_pending_writes or 1024)
+
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_errors = 0
+        self.dropped_writes = 0
+
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()  # One read at a time on the shared reader connection
+        self._writes = None  # This process's queue of (key, blob, stored_at) for the writer thread
+        self._writer = None
+        self._writer_pid = None
+        if self.path:
+            self._connection()  # Fail at startup, not on the first request, if the path is unusable
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=DISK_BUSY_TIMEOUT, check_same_thread=False)
+        # WAL lets readers and the writer of every server process use the file at once, and
+        # synchronous=NORMAL skips the fsync per commit; a crash loses at most recent entries
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.name}" '
+            '(key TEXT PRIMARY KEY, value BLOB NOT NULL, stored_at REAL NOT NULL)'
+        )
+        db.commit()
+        return db
+
+    def _connection(self):
+        """This process's reader connection; one inherited across a fork is never reused"""
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = self._connect()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _recall(self, key):
+        """Memory tier lookup"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _load(self, key):
+        """SQLite tier lookup, promoting a hit into memory"""
+        blob = None
+        if self.path:
+            try:
+                with self._db_lock:
+                    row = self._connection().execute(f'SELECT value FROM "{self.name}" WHERE key = ?', (key,)).fetchone()
+                blob = row[0] if row is not None else None
+            except sqlite3.Error:
+                with self._lock:
+                    self.disk_errors += 1
+
+        if blob is not None:
+            try:
+                value = pickle.loads(blob)
+            except UNREADABLE_ENTRY_ERRORS:
+                # Truncated, or pickled by a version whose classes have since changed
+                self._discard(key)
+                blob = None
+        if blob is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, value, len(blob))
+            return value
+
+    def _discard(self, key):
+        """Count an unreadable row and delete it, so it is not read again"""
+        with self._lock:
+            self.disk_errors += 1
+        try:
+            with self._db_lock:
+                db = self._connection()
+                with db:
+                    db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+        except sqlite3.Error:
+            pass  # Still unreadable next time, and counted again
+
+    def get(self, key):
+        """Return the cached value or None; may wait on the SQLite tier, so async code uses get_async"""
+        value = self._recall(key)
+        return value if value is not None else self._load(key)
+
+    async def get_async(self, key):
+        """get for the event loop: a memory miss reads the SQLite tier in a worker thread"""
+        value = self._recall(key)
+        if value is not None:
+            return value
+        if self.path:
+            return await asyncio.to_thread(self._load, key)
+        return self._load(key)
+
+    def put(self, key, value):
+        """Store in memory now; the SQLite tier is written in the background"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, value, len(blob))
+        if self.path:
+            try:
+                self._write_queue().put_nowait((key, blob, time.time()))
+            except queue.Full:
+                with self._lock:
+                    self.dropped_writes += 1
+
+    def _write_queue(self):
+        """This process's write queue, starting its writer thread; threads do not survive a fork"""
+        if self._writer_pid != os.getpid():
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    self._writes = queue.Queue(self.max_pending_writes)
+                    self._writer = threading.Thread(
+                        target=self._write_loop, args=(self._writes,), name=f'result-cache-{self.name}', daemon=True
+                    )
+                    self._writer.start()
+                    self._writer_pid = os.getpid()
+        return self._writes
+
+    def _write_loop(self, writes):
+        """Write whatever is queued in one transaction, repeatedly, until close() queues None"""
+        db = None
+        written = 0
+        while True:
+            batch = [writes.get()]
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(writes.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch
+            rows = [row for row in batch if row is not None]
+            try:
+                if rows:
+                    db = db or self._connect()
+                    with db:
+                        db.executemany(
+                            f'INSERT OR REPLACE INTO "{self.name}" (key, value, stored_at) VALUES (?, ?, ?)', rows
+                        )
+                        if written // TRIM_EVERY != (written + len(rows)) // TRIM_EVERY:
+                            self._trim_disk(db)
+                    written += len(rows)
+            except sqlite3.Error:
+                with self._lock:
+                    self.disk_errors += 1
+            if closing:
+                if db is not None:
+                    db.close()
+                return
+
+    def close(self, timeout=5.0):
+        """Flush pending SQLite writes and stop the writer thread"""
+        if self._writer is not None and self._writer_pid == os.getpid():
+            self._writes.put(None)
+            self._writer.join(timeout)
+            self._writer = self._writer_pid = None
+
+    def _remember(self, key, value, size):
+        """Insert into the memory tier and evict least-recently-used entries over budget"""
+        if size > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _trim_disk(self, db):
+        db.execute(
+            f'DELETE FROM "{self.name}" WHERE key IN '
+            f'(SELECT key FROM "{self.name}" ORDER BY stored_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_disk_entries,)
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_errors': self.disk_errors,
+                'dropped_writes': self.dropped_writes,
+                'pending_writes': self._writes.qsize() if self._writes is not None else 0,
+                'persistent': bool(self.path)
+            }
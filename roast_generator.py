@@ -1,18 +1,63 @@
-from openai import OpenAI
+import asyncio
+import dataclasses
+import json
 import random
-from typing import Dict, List
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+from content_filter import ContentFilter
+from metrics import FALLBACKS, LLM_REQUESTS, STAGE_SECONDS
+from photo_features import PhotoFeatures, as_features, unpack_bucket
+from result_cache import content_key, features_key
+from single_flight import SingleFlight
+from template_engine import RoastTemplates
+
+# Middle jokes per routine length; unknown durations get the short set
+STANDUP_LENGTHS = {'short': 1, 'medium': 3, 'long': 5}
+
 load_dotenv()
 
+
+def _llm_outcome(error: Exception) -> str:
+    """Metrics label for a failed LLM call"""
+    from openai import APITimeoutError
+    return 'timeout' if isinstance(error, (asyncio.TimeoutError, APITimeoutError)) else 'error'
+
 class RoastGenerator:
-    def __init__(self):
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key or api_key == 'your_api_key_here':
-            self.client = None
-        else:
-            self.client = OpenAI(api_key=api_key)
+    def __init__(self, cache=None):
+        # Optional ResultCache for LLM roasts; fallback lines are never cached
+        self.cache = cache
+        self.api_key = os.getenv('OPENAI_API_KEY')
+        self.base_url = os.getenv('OPENAI_BASE_URL') or None  # e.g. a local stub server
+        self.timeout = float(os.getenv('LLM_TIMEOUT', 10))
+        self.queue_timeout = float(os.getenv('LLM_QUEUE_TIMEOUT', 0.5))
+        self.max_concurrency = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+        self.batch_size = int(os.getenv('LLM_BATCH_SIZE', 8))  # photos described per batch LLM call
+        if not self.api_key or self.api_key == 'your_api_key_here':
+            self.api_key = None
+        
+        # The OpenAI SDK is slow to import, so both clients are created on first use
+        self._client = None
+        self._async_client = None
+        # Created on the event loop that first uses it; before Python 3.10 a semaphore
+        # made at import time binds to a different loop than the server's
+        self._llm_slots = None
+        self._llm_slots_loop = None
+        # Bursts of identical prompts (suggestion buttons, viral photos) share one upstream call
+        self.flights = SingleFlight()
+        
+        self.content_filter = ContentFilter()
+        
+        try:
+            self.templates = RoastTemplates()
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load roast templates: {e}")
+            self.templates = None
         self.humor_styles = {
             'savage': {
                 'intensity': 'brutal and merciless',
@@ -36,81 +81,532 @@ class RoastGenerator:
             }
         }
     
-    def generate_roast(self, photo_features: Dict, style: str = 'playful') -> str:
+    @property
+    def client(self) -> Optional['OpenAI']:
+        """Blocking OpenAI client, or None without an API key"""
+        if self._client is None and self.api_key:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+        return self._client
+    
+    def generate_roast(self, photo_features: PhotoFeatures, style: str = 'playful', cache_key: Optional[str] = None) -> str:
         """Generate a personalized roast based on photo analysis"""
-        prompt = self._build_roast_prompt(photo_features, style)
-        
         if not self.client:
             return self._fallback_roast(photo_features, style)
+        
+        if cache_key and self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
             
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a witty AI comedian specializing in photo roasts. Be creative and funny but never cruel or offensive."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,
-                temperature=0.8
-            )
+            roast = self._filter_content(self._complete(self._roast_request(photo_features, style), 'roast'))
+            self._store_roast(cache_key, photo_features, style, roast)
+            return roast
+            
+        except Exception as e:
+            return self._fallback_roast(photo_features, style)
+    
+    async def generate_roast_async(self, photo_features: PhotoFeatures, style: str = 'playful', cache_key: Optional[str] = None,
+                                   pool=None) -> str:
+        """Non-blocking generate_roast for use inside request handlers; `pool` is an optional RoastPool to answer from"""
+        if not self.api_key:
+            return self._fallback_roast(photo_features, style)
+        
+        if cache_key and self.cache is not None:
+            cached = await self.cache.get_async(cache_key)
+            if cached is not None:
+                return cached
+        
+        # A pre-generated roast for this kind of photo beats waiting on the LLM
+        roast = pool.take(photo_features, style) if pool is not None else None
+        if roast is not None:
+            self._store_roast(cache_key, photo_features, style, roast)
+            return roast
+        
+        try:
+            content = await self._complete_async(self._roast_request(photo_features, style), 'roast')
             
-            roast = response.choices[0].message.content.strip()
-            return self._filter_content(roast)
+            roast = self._filter_content(content)
+            self._store_roast(cache_key, photo_features, style, roast)
+            return roast
             
         except Exception as e:
             return self._fallback_roast(photo_features, style)
     
-    def generate_comeback(self, user_message: str, context: str = "") -> str:
-        """Generate witty comeback to user input"""
-        prompt = f"""
-        User said: "{user_message}"
-        Context: {context}
+    async def generate_roasts_batch_async(self, features_list: List[PhotoFeatures], style: str = 'playful',
+                                          cache_keys: Optional[List[Optional[str]]] = None) -> List[str]:
+        """Roast several photos, packing up to batch_size of them into each LLM call"""
+        if not self.api_key:
+            return [self._fallback_roast(features, style) for features in features_list]
         
-        Generate a witty, clever comeback that's funny but not mean-spirited.
-        Keep it under 50 words.
-        """
+        cache_keys = cache_keys or [None] * len(features_list)
+        roasts = [None] * len(features_list)
+        if self.cache is not None:
+            for i, key in enumerate(cache_keys):
+                if key:
+                    roasts[i] = await self.cache.get_async(key)
         
+        pending = [i for i, roast in enumerate(roasts) if roast is None]
+        chunks = [pending[k:k + self.batch_size] for k in range(0, len(pending), self.batch_size)]
+        results = await asyncio.gather(
+            *[self._roast_chunk_async([features_list[i] for i in chunk], style) for chunk in chunks],
+            return_exceptions=True
+        )
+        
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                result = [None] * len(chunk)
+            for i, roast in zip(chunk, result):
+                if roast:
+                    roast = self._filter_content(roast)
+                    self._store_roast(cache_keys[i], features_list[i], style, roast)
+                else:
+                    roast = self._fallback_roast(features_list[i], style)
+                roasts[i] = roast
+        
+        return roasts
+    
+    async def generate_pool_roasts_async(self, photo_features: PhotoFeatures, style: str, count: int) -> List[str]:
+        """Several distinct filtered roasts for one feature bucket, to be served later; raises on failure"""
+        # Not coalesced: refills of the same bucket must each get fresh lines
+        content = await self._request_async(self._pool_roast_request(photo_features, style, count), 'pool')
+        roasts = json.loads(content[content.find('['):content.rfind(']') + 1])
+        if not isinstance(roasts, list):
+            raise ValueError("Pool reply is not a list of roasts")
+        return [self._filter_content(str(roast).strip()) for roast in roasts if str(roast).strip()]
+    
+    def generate_comeback(self, user_message: str, context: str = "") -> str:
+        """Generate witty comeback to user input"""
         if not self.client:
             return self._fallback_comeback()
             
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a quick-witted comedian. Generate clever comebacks that are funny but not hurtful."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=80,
-                temperature=0.9
-            )
-            
-            return response.choices[0].message.content.strip()
+            return self._complete(self._comeback_request(user_message, context), 'comeback')
             
         except Exception as e:
             return self._fallback_comeback()
     
-    def create_standup_routine(self, photo_features: Dict, duration: str = "short") -> List[str]:
+    async def generate_comeback_async(self, user_message: str, context: str = "") -> str:
+        """Non-blocking generate_comeback for use inside request handlers"""
+        if not self.api_key:
+            return self._fallback_comeback()
+        
+        try:
+            return await self._complete_async(self._comeback_request(user_message, context), 'comeback')
+        except Exception as e:
+            return self._fallback_comeback()
+    
+    def chat_response(self, user_message: str, history: Optional[List[Tuple[str, str]]] = None) -> str:
+        """Reply to a chat message, given the session's earlier (user, ai) turns"""
+        if not self.client:
+            return self._fallback_chat(user_message)
+        
+        try:
+            return self._filter_content(self._complete(self._chat_request(user_message, history or []), 'chat'))
+        except Exception as e:
+            return self._fallback_chat(user_message)
+    
+    async def chat_response_async(self, user_message: str, history: Optional[List[Tuple[str, str]]] = None) -> str:
+        """Non-blocking chat_response for use inside request handlers"""
+        if not self.api_key:
+            return self._fallback_chat(user_message)
+        
+        try:
+            return self._filter_content(await self._complete_async(self._chat_request(user_message, history or []), 'chat'))
+        except Exception as e:
+            return self._fallback_chat(user_message)
+    
+    async def stream_roast(self, photo_features: PhotoFeatures, style: str = 'playful', cache_key: Optional[str] = None,
+                           pool=None) -> AsyncIterator[str]:
+        """Yield a filtered roast piece by piece as the LLM produces it; a cached or pooled roast comes whole"""
+        if not self.api_key:
+            yield self._fallback_roast(photo_features, style)
+            return
+        
+        if cache_key and self.cache is not None:
+            cached = await self.cache.get_async(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        roast = pool.take(photo_features, style) if pool is not None else None
+        if roast is not None:
+            self._store_roast(cache_key, photo_features, style, roast)
+            yield roast
+            return
+        
+        parts = []
+        content_filter = self.content_filter.stream()
+        try:
+            async for delta in self._stream_async(self._roast_request(photo_features, style), 'roast'):
+                text = content_filter.feed(delta)
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            if not parts:
+                yield self._fallback_roast(photo_features, style)
+            return
+        
+        text = content_filter.flush()
+        if text:
+            parts.append(text)
+            yield text
+        
+        roast = "".join(parts).strip()
+        if roast:
+            self._store_roast(cache_key, photo_features, style, roast)
+    
+    async def stream_comeback(self, user_message: str, context: str = "") -> AsyncIterator[str]:
+        """Yield a comeback piece by piece as the LLM produces it"""
+        if not self.api_key:
+            yield self._fallback_comeback()
+            return
+        
+        started = False
+        try:
+            async for delta in self._stream_async(self._comeback_request(user_message, context), 'comeback'):
+                started = True
+                yield delta
+        except Exception as e:
+            if not started:
+                yield self._fallback_comeback()
+    
+    def create_standup_routine(self, photo_features: PhotoFeatures, duration: str = "short", style: str = 'playful') -> List[str]:
         """Create a mini stand-up routine based on photo"""
-        jokes = []
+        opening = self._cached_roast(photo_features, style)
+        if not self.client:
+            return self._standup_jokes(opening or self._fallback_roast(photo_features, style), photo_features, duration)
+        
+        try:
+            # The whole routine comes back from a single request
+            content = self._complete(self._standup_request(photo_features, style, duration, opening), 'standup')
+            return self._parse_standup(content, opening)
+        except Exception as e:
+            return self._standup_jokes(opening or self._fallback_roast(photo_features, style), photo_features, duration)
+    
+    async def create_standup_routine_async(self, photo_features: PhotoFeatures, duration: str = "short", style: str = 'playful') -> List[str]:
+        """Non-blocking create_standup_routine for use inside request handlers"""
+        opening = await self._cached_roast_async(photo_features, style)
+        if not self.api_key:
+            return self._standup_jokes(opening or self._fallback_roast(photo_features, style), photo_features, duration)
+        
+        try:
+            content = await self._complete_async(self._standup_request(photo_features, style, duration, opening), 'standup')
+            return self._parse_standup(content, opening)
+        except Exception as e:
+            return self._standup_jokes(opening or self._fallback_roast(photo_features, style), photo_features, duration)
+    
+    def warm_up(self):
+        """Import the OpenAI SDK ahead of the first LLM call"""
+        if self.api_key:
+            import openai  # noqa: F401
+    
+    async def aclose(self):
+        """Release pooled connections held by the async client"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+    
+    def _get_async_client(self) -> 'AsyncOpenAI':
+        """Shared AsyncOpenAI client backed by one pooled HTTP connection pool"""
+        if self._async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+            
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                timeout=self.timeout
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                timeout=self.timeout,
+                max_retries=0
+            )
+        return self._async_client
+    
+    def _complete(self, request: Dict, kind: str) -> str:
+        """Run one blocking chat completion, recording its latency and outcome"""
+        started = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(**request)
+        except Exception as e:
+            LLM_REQUESTS.labels(kind, _llm_outcome(e)).inc()
+            raise
+        finally:
+            STAGE_SECONDS.labels('llm').observe(time.perf_counter() - started)
+        
+        LLM_REQUESTS.labels(kind, 'ok').inc()
+        return response.choices[0].message.content.strip()
+    
+    async def _acquire_slot(self, kind: str):
+        """Wait for an LLM slot; waiting longer than queue_timeout raises, so callers fall back fast"""
+        loop = asyncio.get_running_loop()
+        if self._llm_slots_loop is not loop:
+            self._llm_slots = asyncio.Semaphore(self.max_concurrency)
+            self._llm_slots_loop = loop
+        try:
+            await asyncio.wait_for(self._llm_slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            LLM_REQUESTS.labels(kind, 'busy').inc()
+            raise
+    
+    async def _complete_async(self, request: Dict, kind: str = 'roast') -> str:
+        """Run one chat completion, shared with identical concurrent requests"""
+        return await self.flights.run(self._flight_key(request), lambda: self._request_async(request, kind))
+    
+    def _flight_key(self, request: Dict) -> str:
+        """Requests that differ only in case or whitespace get the same key"""
+        normalised = dict(request, messages=[
+            dict(message, content=" ".join(message['content'].split()).casefold())
+            for message in request['messages']
+        ])
+        return content_key(json.dumps(normalised, sort_keys=True).encode('utf-8'))
+    
+    async def _request_async(self, request: Dict, kind: str) -> str:
+        """Run one chat completion under the global concurrency limit and time budget"""
+        await self._acquire_slot(kind)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self._get_async_client().chat.completions.create(**request),
+                timeout=self.timeout
+            )
+        except Exception as e:
+            LLM_REQUESTS.labels(kind, _llm_outcome(e)).inc()
+            raise
+        finally:
+            self._llm_slots.release()
+            STAGE_SECONDS.labels('llm').observe(time.perf_counter() - started)
+        
+        LLM_REQUESTS.labels(kind, 'ok').inc()
+        return response.choices[0].message.content.strip()
+    
+    async def _stream_async(self, request: Dict, kind: str = 'stream') -> AsyncIterator[str]:
+        """Stream content deltas of one chat completion under the same limits as _complete_async"""
+        await self._acquire_slot(kind)
+        started = time.perf_counter()
+        try:
+            stream = await asyncio.wait_for(
+                self._get_async_client().chat.completions.create(stream=True, **request),
+                timeout=self.timeout
+            )
+            # Streams are bounded per chunk so a stalled connection cannot hang the response
+            iterator = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            LLM_REQUESTS.labels(kind, _llm_outcome(e)).inc()
+            raise
+        else:
+            LLM_REQUESTS.labels(kind, 'ok').inc()
+        finally:
+            self._llm_slots.release()
+            STAGE_SECONDS.labels('llm').observe(time.perf_counter() - started)
+    
+    async def _roast_chunk_async(self, features_list: List[PhotoFeatures], style: str) -> List[str]:
+        """One LLM call for a group of photos; raises if the reply cannot be matched up"""
+        if len(features_list) == 1:
+            return [await self._complete_async(self._roast_request(features_list[0], style), 'roast')]
+        
+        content = await self._complete_async(self._batch_roast_request(features_list, style), 'batch')
+        roasts = json.loads(content[content.find('['):content.rfind(']') + 1])
+        if not isinstance(roasts, list) or len(roasts) != len(features_list):
+            raise ValueError("Batch reply does not match the number of photos")
+        return [str(roast).strip() for roast in roasts]
+    
+    def _roast_request(self, features: PhotoFeatures, style: str) -> Dict:
+        """Chat completion arguments for a photo roast"""
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are a witty AI comedian specializing in photo roasts. Be creative and funny but never cruel or offensive."},
+                {"role": "user", "content": self._build_roast_prompt(features, style)}
+            ],
+            "max_tokens": 150,
+            "temperature": 0.8
+        }
+    
+    def _batch_roast_request(self, features_list: List[PhotoFeatures], style: str) -> Dict:
+        """Chat completion arguments for roasting several photos in one reply"""
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are a witty AI comedian specializing in photo roasts. Be creative and funny but never cruel or offensive."},
+                {"role": "user", "content": self._build_batch_prompt(features_list, style)}
+            ],
+            "max_tokens": 120 * len(features_list),
+            "temperature": 0.8
+        }
+    
+    def _pool_roast_request(self, features: PhotoFeatures, style: str, count: int) -> Dict:
+        """Chat completion arguments for several different roasts of the same kind of photo"""
+        style_info = self.humor_styles.get(style, self.humor_styles['playful'])
+        prompt = f"""
+        Create {style_info['intensity']} roasts with a {style_info['tone']} tone, {style_info['examples']}.
+        
+        Photo analysis:
+{self._describe_bucket(features)}
+        
+        Generate {count} different witty roasts (max 2 sentences each) that are funny but not cruel.
+        Only mention what the analysis says, so each roast fits any photo like this one.
+        Reply with only a JSON array of {count} strings.
+        """
+        
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are a witty AI comedian specializing in photo roasts. Be creative and funny but never cruel or offensive."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 120 * count,
+            "temperature": 0.9
+        }
+    
+    def _comeback_request(self, user_message: str, context: str) -> Dict:
+        """Chat completion arguments for a comeback"""
+        prompt = f"""
+        User said: "{" ".join(user_message.split())}"
+        Context: {context}
+        
+        Generate a witty, clever comeback that's funny but not mean-spirited.
+        Keep it under 50 words.
+        """
+        
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are a quick-witted comedian. Generate clever comebacks that are funny but not hurtful."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 80,
+            "temperature": 0.9
+        }
+    
+    def _chat_request(self, user_message: str, history: List[Tuple[str, str]]) -> Dict:
+        """Chat completion arguments for a chat reply, replaying the stored turns as messages"""
+        messages = [{"role": "system", "content": "You are AI Roast Master, a sassy comedian chatting with a user. Be playful and witty, tease but never insult, and keep replies under 40 words."}]
+        for user, ai in history:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": ai})
+        messages.append({"role": "user", "content": user_message})
+        
+        return {
+            "model": "gpt-4",
+            "messages": messages,
+            "max_tokens": 80,
+            "temperature": 0.9
+        }
+    
+    def _features_cache_key(self, features: PhotoFeatures, style: str) -> str:
+        return f"features:{features_key(features)}:{style}"
+    
+    def _cached_roast(self, features: PhotoFeatures, style: str) -> Optional[str]:
+        """A roast already generated for these exact features and style, if any"""
+        if self.cache is None:
+            return None
+        return self.cache.get(self._features_cache_key(features, style))
+    
+    async def _cached_roast_async(self, features: PhotoFeatures, style: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return await self.cache.get_async(self._features_cache_key(features, style))
+    
+    def _store_roast(self, cache_key: Optional[str], features: PhotoFeatures, style: str, roast: str):
+        """Cache an LLM roast by request key and by features, so /standup can reuse it"""
+        if self.cache is None:
+            return
+        if cache_key:
+            self.cache.put(cache_key, roast)
+        self.cache.put(self._features_cache_key(features, style), roast)
+    
+    def _standup_request(self, features: PhotoFeatures, style: str, duration: str, opening: Optional[str]) -> Dict:
+        """Chat completion arguments for a whole routine in one structured reply"""
+        style_info = self.humor_styles.get(style, self.humor_styles['playful'])
+        middle = STANDUP_LENGTHS.get(duration, STANDUP_LENGTHS['short'])
+        if opening:
+            opener = f'The routine opens with this line, which the audience has already heard: "{opening}"'
+            shape = '{"middle": [...], "closer": "..."}'
+        else:
+            opener = "Start with an opening roast of the photo."
+            shape = '{"opening": "...", "middle": [...], "closer": "..."}'
+        
+        prompt = f"""
+        Write a mini stand-up routine about a photo, {style_info['intensity']} with a {style_info['tone']} tone, {style_info['examples']}.
+        
+        Photo analysis:
+{self._describe_features(features)}
+        
+        {opener}
+        Then {middle} middle joke(s) about specific things in the photo, and a closing line.
+        Each joke max 2 sentences, funny but not cruel.
+        Reply with only a JSON object shaped like {shape}.
+        """
+        
+        return {
+            "model": "gpt-4",
+            "messages": [
+                {"role": "system", "content": "You are a witty AI comedian specializing in photo roasts. Be creative and funny but never cruel or offensive."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": 80 * (middle + 2),
+            "temperature": 0.8
+        }
+    
+    def _parse_standup(self, content: str, opening: Optional[str]) -> List[str]:
+        """Turn the structured routine reply into filtered jokes; raises if it is malformed"""
+        routine = json.loads(content[content.find('{'):content.rfind('}') + 1])
+        opening = opening or routine['opening']
+        middle = routine.get('middle', [])
+        if isinstance(middle, str):
+            middle = [middle]
         
-        # Opening joke
-        opening = self.generate_roast(photo_features, 'playful')
-        jokes.append(f"So I was looking at this photo and... {opening}")
+        jokes = [f"So I was looking at this photo and... {opening}"]
+        jokes.extend(str(joke) for joke in middle)
+        jokes.append(str(routine['closer']))
+        return [self._filter_content(joke.strip()) for joke in jokes]
+    
+    def _standup_jokes(self, opening: str, photo_features: PhotoFeatures, duration: str) -> List[str]:
+        """Assemble a routine around an opening roast without calling the LLM"""
+        FALLBACKS.labels('standup').inc()
+        count = STANDUP_LENGTHS.get(duration, STANDUP_LENGTHS['short'])
+        features = as_features(photo_features)
         
         # Middle jokes based on specific features
-        if photo_features.get('faces', {}).get('count', 0) > 1:
-            jokes.append("I see multiple people in this photo. Safety in numbers, smart choice!")
+        middle = []
+        if features.faces.count > 1:
+            middle.append("I see multiple people in this photo. Safety in numbers, smart choice!")
+        
+        if features.objects.glasses:
+            middle.append("Those glasses are so thick, I bet you can see into next week!")
         
-        if photo_features.get('objects', {}).get('glasses'):
-            jokes.append("Those glasses are so thick, I bet you can see into next week!")
+        # Longer routines are padded out with template lines
+        for _ in range(count * 3):
+            if len(middle) >= count or not self.templates:
+                break
+            line = self.templates.pick(photo_features)
+            if not line:
+                break
+            if line not in middle and line != opening:
+                middle.append(line)
         
         # Closing joke
         closing = "But hey, at least you're brave enough to share photos online. That takes confidence... or poor judgment!"
-        jokes.append(closing)
         
-        return jokes[:3] if duration == "short" else jokes
+        return [f"So I was looking at this photo and... {opening}", *middle[:count], closing]
     
-    def _build_roast_prompt(self, features: Dict, style: str) -> str:
+    def _build_roast_prompt(self, features: PhotoFeatures, style: str) -> str:
         """Build prompt for roast generation"""
         style_info = self.humor_styles.get(style, self.humor_styles['playful'])
         
@@ -118,11 +614,7 @@ class RoastGenerator:
         Create a {style_info['intensity']} roast with a {style_info['tone']} tone, {style_info['examples']}.
         
         Photo analysis:
-        - Faces detected: {features.get('faces', {}).get('count', 0)}
-        - Face features: {features.get('faces', {}).get('features', [])}
-        - Objects: {features.get('objects', {})}
-        - Color theme: {features.get('colors', {}).get('theme', 'unknown')}
-        - Image quality: {features.get('composition', {}).get('resolution', 'unknown')}
+{self._describe_features(features)}
         
         Generate ONE witty roast (max 2 sentences) that's funny but not cruel.
         Focus on obvious visual elements that would be funny to comment on.
@@ -130,20 +622,60 @@ class RoastGenerator:
         
         return prompt
     
-    def _filter_content(self, roast: str) -> str:
-        """Filter inappropriate content"""
-        # Simple content filtering
-        inappropriate_words = ['ugly', 'stupid', 'fat', 'dumb']
-        filtered_roast = roast
+    def _build_batch_prompt(self, features_list: List[PhotoFeatures], style: str) -> str:
+        """Build one prompt asking for a roast of each of several photos"""
+        style_info = self.humor_styles.get(style, self.humor_styles['playful'])
+        photos = "\n".join(
+            f"        Photo {i}:\n{self._describe_features(features)}"
+            for i, features in enumerate(features_list, 1)
+        )
         
-        for word in inappropriate_words:
-            if word.lower() in filtered_roast.lower():
-                filtered_roast = filtered_roast.replace(word, "interesting")
+        prompt = f"""
+        Create {style_info['intensity']} roasts with a {style_info['tone']} tone, {style_info['examples']}.
+        
+{photos}
         
-        return filtered_roast
+        Generate ONE witty roast (max 2 sentences) per photo that's funny but not cruel.
+        Reply with only a JSON array of {len(features_list)} strings, in photo order.
+        """
+        
+        return prompt
     
-    def _fallback_roast(self, features: Dict, style: str) -> str:
+    def _describe_features(self, features: PhotoFeatures) -> str:
+        """Photo analysis lines shared by the single and batch prompts"""
+        features = as_features(features)
+        return f"""        - Faces detected: {features.faces.count}
+        - Face features: {[dataclasses.asdict(face) for face in features.faces.features]}
+        - Objects: {dataclasses.asdict(features.objects)}
+        - Color theme: {features.colors.theme or 'unknown'}
+        - Image quality: {features.composition.resolution or 'unknown'}"""
+    
+    def _describe_bucket(self, features: PhotoFeatures) -> str:
+        """Photo analysis lines for a whole feature bucket: face size classes, never measurements"""
+        features = as_features(features)
+        count, sizes, _, _, _, _ = unpack_bucket(features.bucket)
+        return f"""        - Faces detected: {'2 or more' if count >= 2 else count}
+        - Face sizes: {', '.join(sizes) or 'none'}
+        - Objects: {dataclasses.asdict(features.objects)}
+        - Color theme: {features.colors.theme or 'unknown'}
+        - Image quality: {features.composition.resolution or 'unknown'}"""
+    
+    def _filter_content(self, roast: str) -> str:
+        """Filter inappropriate content"""
+        return self.content_filter.filter(roast)
+    
+    def template_roast(self, photo_features: PhotoFeatures, session: Optional[str] = None) -> str:
+        """Roast from roast_templates.json with no LLM call"""
+        line = self.templates.pick(photo_features, session) if self.templates else None
+        return line or self._generic_roast()
+    
+    def _fallback_roast(self, features: PhotoFeatures, style: str) -> str:
         """Fallback roasts when API fails"""
+        FALLBACKS.labels('roast').inc()
+        return self.template_roast(features)
+    
+    def _generic_roast(self) -> str:
+        """Roasts for photos no template category applies to"""
         fallbacks = [
             "I'd roast you, but I'm afraid you'd melt from all that heat!",
             "This photo has more filters than a coffee shop!",
@@ -154,8 +686,24 @@ class RoastGenerator:
         
         return random.choice(fallbacks)
     
+    def _fallback_chat(self, user_message: str) -> str:
+        """Fallback chat replies when API fails"""
+        FALLBACKS.labels('chat').inc()
+        responses = [
+            "Oh, you want to chat? How adorable! 😏",
+            "I'm here to roast, not to be your therapist! 🔥",
+            "That's... actually not terrible. Are you feeling okay? 🤔",
+            "I've heard funnier things from a broken calculator! 😂"
+        ]
+        return responses[len(user_message) % len(responses)]
+    
     def _fallback_comeback(self) -> str:
         """Fallback comebacks when API fails"""
+        FALLBACKS.labels('comeback').inc()
+        line = self.templates.pick_category('generic') if self.templates else None
+        if line:
+            return line
+        
         comebacks = [
             "That's what they all say!",
             "I've heard better comebacks from a broken boomerang!",
@@ -163,4 +711,4 @@ class RoastGenerator:
             "Is that your final answer or are you still loading?"
         ]
         
-        return random.choice(comebacks)
\ No newline at end of file
+        return random.choice(comebacks)
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from photo_features import PhotoFeatures, as_features
+
+
+def bucket_key(features, style):
+    """(style, PhotoFeatures.bucket): everything a roast prompt really varies on"""
+    return style, as_features(features).bucket
+
+
+def bucket_features(key):
+    """Minimal features describing a bucket, so pooled roasts fit every photo in it"""
+    return PhotoFeatures.from_bucket(key[1])
+
+
+class RoastPool:
+    """Pre-generated roasts per (style, feature bucket), refilled in the background by demand"""
+
+    def __init__(self, generator, size=None, batch=None, max_buckets=None, half_life=None):
+        self.generator = generator
+        self.size = int(size if size is not None else os.getenv('ROAST_POOL_SIZE', 8))  # 0 disables the pool
+        # Roasts asked for per LLM call; a bucket is refilled once it has room for a whole batch
+        self.batch = max(1, min(int(batch or os.getenv('ROAST_POOL_BATCH', 4)), self.size))
+        self.max_buckets = int(max_buckets or os.getenv('ROAST_POOL_MAX_BUCKETS', 256))
+        self.half_life = float(half_life or os.getenv('ROAST_POOL_DEMAND_HALF_LIFE', 300))
+        self.retry_delay = 1.0
+
+        self._pools = {}  # bucket -> deque of unused roasts
+        self._demand = {}  # bucket -> decayed request count
+        self._decayed_at = time.monotonic()
+        self._wanted = None  # asyncio.Event made by start() on the server's loop; see RoastGenerator._llm_slots
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0 and bool(self.generator.api_key)
+
+    def take(self, features, style):
+        """A ready roast for the photo's bucket, or None; either way the bucket's demand goes up"""
+        if not self.enabled:
+            return None
+        key = bucket_key(features, style)
+        self._demand[key] = self._demand.get(key, 0.0) + 1.0
+        if len(self._demand) > self.max_buckets:
+            # Never the bucket just asked for: at demand 1.0 it would usually be the minimum
+            self._forget(min((other for other in self._demand if other != key), key=self._demand.get))
+
+        pool = self._pools.get(key)
+        roast = pool.popleft() if pool else None
+        if roast is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if self._wanted is not None:
+            self._wanted.set()
+        return roast
+
+    def start(self):
+        """Run the refill loop on the current event loop"""
+        if self.enabled and self._task is None:
+            self._wanted = asyncio.Event()
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _forget(self, key):
+        self._demand.pop(key, None)
+        self._pools.pop(key, None)
+
+    def _decay(self):
+        """Halve demand every half_life seconds so the pool follows what is being uploaded now"""
+        now = time.monotonic()
+        halvings = int((now - self._decayed_at) / self.half_life)
+        if halvings < 1:
+            return
+        self._decayed_at += halvings * self.half_life
+        factor = 0.5 ** halvings
+        for key in list(self._demand):
+            self._demand[key] *= factor
+            if self._demand[key] < 0.01 and not self._pools.get(key):
+                self._forget(key)
+
+    def _next_bucket(self):
+        """The bucket with the most demand per ready roast among those with room for a batch, or None"""
+        self._decay()
+        best, best_need = None, 0.0
+        for key, demand in self._demand.items():
+            ready = len(self._pools.get(key, ()))
+            # Topping up after every hit would cost one LLM call per roast served
+            if self.size - ready >= self.batch and demand / (ready + 1) > best_need:
+                best, best_need = key, demand / (ready + 1)
+        return best
+
+    async def _refill_loop(self):
+        """One LLM call at a time, always for the bucket with the most unmet demand"""
+        while True:
+            key = self._next_bucket()
+            if key is None:
+                self._wanted.clear()
+                await self._wanted.wait()
+                continue
+
+            pool = self._pools.get(key) or deque()
+            try:
+                roasts = await self.generator.generate_pool_roasts_async(bucket_features(key), key[0], self.batch)
+            except Exception as e:
+                # LLM busy, slow or down; requests fall back to on-demand roasts meanwhile
+                self.failures += 1
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            if key not in self._demand:
+                continue  # Evicted while the call was running
+            pool = self._pools.setdefault(key, pool)
+            added = 0
+            for roast in roasts:
+                if len(pool) < self.size and roast not in pool:
+                    pool.append(roast)
+                    added += 1
+            self.generated += added
+            if not added:
+                # Nothing usable came back (all filtered or repeats); don't hammer the LLM
+                self.failures += 1
+                await asyncio.sleep(self.retry_delay)
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'buckets': len(self._demand),
+            'ready': sum(len(pool) for pool in self._pools.values()),
+            'hits': self.hits,
+            'misses': self.misses,
+            'generated': self.generated,
+            'failures': self.failures
+        }
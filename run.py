@@ -2,30 +2,153 @@
 """
 AI Roast Master - Launch Script
 Run this to start the application
+
+    python run.py                              # development: one process, auto-reload
+    python run.py --production --workers 8     # pre-fork server using every core
 """
 
-import sys
+import argparse
 import os
+import signal
+import socket
+import sys
+import time
 from pathlib import Path
 
-# Add backend to path
-backend_path = Path(__file__).parent / "backend"
-sys.path.insert(0, str(backend_path))
+PROJECT_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+
+def parse_args():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Start the AI Roast Master server")
+    parser.add_argument('--production', action='store_true',
+                        help='pre-fork worker processes instead of the auto-reloading development server')
+    parser.add_argument('--host', default=os.getenv('HOST'),
+                        help='bind address (default: 0.0.0.0 in production, 127.0.0.1 otherwise)')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8001)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', cores)),
+                        help='server processes in production mode (default: one per core)')
+    parser.add_argument('--pool-workers', type=int, default=os.getenv('ANALYZER_WORKERS'),
+                        help='photo analysis workers per process (default: cores / processes, at least 1)')
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.getenv('GRACEFUL_TIMEOUT', 30)),
+                        help='seconds in-flight requests get to finish after SIGTERM')
+    args = parser.parse_args()
+
+    args.workers = max(1, args.workers)
+    if args.pool_workers is None:
+        args.pool_workers = max(1, cores // args.workers) if args.production else cores
+    args.host = args.host or ('0.0.0.0' if args.production else '127.0.0.1')
+    return args
+
+
+def serve_development(args):
+    import uvicorn
+
+    print("Starting AI Roast Master...")
+    print(f"Open your browser to: http://localhost:{args.port}")
+    print("Press Ctrl+C to stop")
+    uvicorn.run("api:app", host=args.host, port=args.port, reload=True, app_dir=str(PROJECT_DIR))
+
+
+def _bind(host, port):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock, args):
+    """Body of one forked server process; uvicorn drains in-flight requests on SIGTERM"""
+    import uvicorn
+
+    # Own process group, so a terminal Ctrl+C reaches only the supervisor, which
+    # forwards a single SIGTERM (a second signal would make uvicorn skip the drain)
+    os.setpgid(0, 0)
+    # Drop the supervisor's handlers; uvicorn re-raises the signal once it has drained
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, timeout_graceful_shutdown=args.graceful_timeout, log_level='info')
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_production(args):
+    if not hasattr(os, 'fork'):
+        sys.exit("Production mode needs os.fork(); run without --production on this platform")
+
+    import api
+    from analysis_pool import preload
+
+    # Parse the cascades and import the OpenAI SDK once, here, so every forked
+    # process shares those pages copy-on-write instead of loading its own.
+    # Nothing before the fork may start a thread.
+    preload(api.analysis_pool.analyzer_factory, args.pool_workers)
+    api.roast_gen.warm_up()
+
+    sock = _bind(args.host, args.port)
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(api.app, sock, args)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        print(f"Draining {len(children)} workers (up to {args.graceful_timeout:g}s)...")
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Starting AI Roast Master on http://{args.host}:{args.port} "
+          f"with {args.workers} workers x {args.pool_workers} analysis workers")
+    for _ in range(args.workers):
+        spawn()
+
+    deadline = None
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if stopping:
+                deadline = deadline or time.monotonic() + args.graceful_timeout + 5
+                if time.monotonic() > deadline:
+                    for pid in children:
+                        os.kill(pid, signal.SIGKILL)
+            time.sleep(0.2)
+            continue
+
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited ({os.waitstatus_to_exitcode(status)}), starting a replacement")
+            time.sleep(1)  # Don't spin if workers crash on startup
+            spawn()
+
+    sock.close()
+    print("All workers stopped")
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    # Read by AnalysisPool when api is imported
+    os.environ['ANALYZER_WORKERS'] = str(args.pool_workers)
     try:
-        import uvicorn
-        from api import app
-        
-        print("Starting AI Roast Master...")
-        print("Open your browser to: http://localhost:8001")
-        print("Press Ctrl+C to stop")
-        
-        os.chdir(backend_path)
-        uvicorn.run("api:app", host="127.0.0.1", port=8001, reload=True)
-        
+        if args.production:
+            serve_production(args)
+        else:
+            serve_development(args)
     except ImportError as e:
         print(f"Missing dependency: {e}")
         print("Run: pip install -r requirements.txt")
-    except Exception as e:
-        print(f"Error starting server: {e}")
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+
+class SingleFlight:
+    """Share one in-flight call, and briefly its result, between identical async requests"""
+
+    def __init__(self, ttl=None, max_entries=None):
+        # Seconds a successful result keeps answering identical requests; 0 only merges concurrent ones
+        self.ttl = float(ttl if ttl is not None else os.getenv('LLM_COALESCE_TTL', 2.0))
+        self.max_entries = int(max_entries or os.getenv('LLM_COALESCE_MAX_ENTRIES', 1024))
+
+        self._in_flight = {}  # key -> asyncio.Task
+        self._results = OrderedDict()  # key -> (expires_at, value)
+        self.calls = 0
+        self.shared = 0
+        self.reused = 0
+
+    async def run(self, key, call):
+        """Return call()'s result, reusing an identical in-flight call or a fresh result for `key`"""
+        entry = self._results.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.reused += 1
+                return entry[1]
+            del self._results[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.shared += 1
+
+        # Shielded, so one caller going away does not cancel the call for everyone else;
+        # errors and timeouts raised by the call reach every waiter
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        self._in_flight.pop(key, None)
+        if self.ttl <= 0 or task.cancelled() or task.exception() is not None:
+            return
+        self._results[key] = (time.monotonic() + self.ttl, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def stats(self):
+        return {
+            'ttl': self.ttl,
+            'in_flight': len(self._in_flight),
+            'results': len(self._results),
+            'calls': self.calls,
+            'shared': self.shared,
+            'reused': self.reused
+        }
@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Brotli variants are skipped; gzip and identity are always available
+
+PAGES_DIR = Path(__file__).parent
+
+
+class StaticPage:
+    """One HTML page with its precomputed encodings and strong ETags"""
+
+    def __init__(self, body, content_type="text/html; charset=utf-8"):
+        self.content_type = content_type
+        digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+
+        # Strong validators must differ per representation, so each encoding gets its own tag
+        self.variants = {'identity': (body, f'"{digest}"')}
+        self.variants['gzip'] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            self.variants['br'] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+
+def _accepted_encodings(header):
+    """Encodings the client accepts, ignoring those explicitly refused with q=0"""
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if name and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.lower())
+    return accepted
+
+
+class StaticPages:
+    """HTML pages loaded once at startup and served with compression and 304s"""
+
+    def __init__(self, pages, directory=PAGES_DIR):
+        self.pages = {
+            route: StaticPage((Path(directory) / filename).read_bytes())
+            for route, filename in pages.items()
+        }
+
+    def response(self, route, request: Request) -> Response:
+        page = self.pages[route]
+        headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match:
+            tags = {tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip() for tag in if_none_match.split(',')}
+            matched = '*' in tags or tags & page.etags
+            if matched:
+                etag = next(iter(tags & page.etags), page.variants['identity'][1])
+                return Response(status_code=304, headers={**headers, 'ETag': etag})
+
+        accepted = _accepted_encodings(request.headers.get('accept-encoding', ''))
+        encoding = next((e for e in ('br', 'gzip') if e in page.variants and (e in accepted or '*' in accepted)), 'identity')
+        body, etag = page.variants[encoding]
+        headers['ETag'] = etag
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+
+        return Response(content=body, media_type=page.content_type, headers=headers)
@@ -0,0 +1,112 @@
+import json
+import os
+import random
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+from file_watch import WatchedFile
+from photo_features import as_features, unpack_bucket
+
+DEFAULT_TEMPLATES_PATH = Path(__file__).parent / 'roast_templates.json'
+
+# (signal, value) produced from ImageAnalyzer features -> template category
+SIGNAL_CATEGORIES = {
+    ('size', 'large'): 'large_face',
+    ('size', 'small'): 'small_face',
+    ('glasses', True): 'glasses',
+    ('resolution', 'low'): 'low_resolution',
+    ('theme', 'dark'): 'dark_photo',
+    ('theme', 'bright'): 'bright_photo',
+    ('people', 'multiple'): 'multiple_people',
+    ('people', 'single'): 'selfie',
+}
+
+
+@lru_cache(maxsize=None)
+def bucket_signals(bucket):
+    """Signals for a PhotoFeatures.bucket; there are only a few thousand buckets"""
+    count, sizes, theme, resolution, glasses, multiple = unpack_bucket(bucket)
+    signals = [('size', size) for size in sizes]
+    if glasses:
+        signals.append(('glasses', True))
+    signals.append(('resolution', resolution))
+    signals.append(('theme', theme))
+
+    if count > 1 or multiple:
+        signals.append(('people', 'multiple'))
+    elif count == 1:
+        signals.append(('people', 'single'))
+    return tuple(signals)
+
+
+class RoastTemplates:
+    """Zero-cost roast lines from roast_templates.json, reloaded when the file changes"""
+
+    def __init__(self, path=None, reload_interval=2.0, max_sessions=10000):
+        self.path = Path(path or os.getenv('ROAST_TEMPLATES_PATH') or DEFAULT_TEMPLATES_PATH)
+        self.reload_interval = reload_interval
+        self.max_sessions = max_sessions
+
+        self._lock = threading.Lock()
+        self._categories = {}
+        self._signal_index = {}
+        self._bucket_pools = {}  # PhotoFeatures.bucket -> signals that have lines
+        self._decks = OrderedDict()  # (session, category) -> remaining lines
+        self._watch = WatchedFile(self.path, self._load, reload_interval)
+        self._watch.reload()
+
+    def _load(self):
+        """Parse the file and rebuild the signal -> lines index"""
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        # Flatten the top-level groups; category names are unique across them
+        categories = {}
+        for group in data.values():
+            for name, lines in group.items():
+                categories[name] = tuple(lines)
+
+        self._categories = categories
+        self._signal_index = {
+            signal: categories[name]
+            for signal, name in SIGNAL_CATEGORIES.items()
+            if categories.get(name)
+        }
+        self._bucket_pools.clear()
+        self._decks.clear()
+
+    def pick(self, features, session=None):
+        """Choose a roast line for the features, or None when no category applies"""
+        with self._lock:
+            self._watch.poll()
+            bucket = as_features(features).bucket
+            pools = self._bucket_pools.get(bucket)
+            if pools is None:
+                pools = [s for s in bucket_signals(bucket) if s in self._signal_index]
+                self._bucket_pools[bucket] = pools
+            if not pools:
+                return None
+            signal = random.choice(pools)
+            return self._draw(session, SIGNAL_CATEGORIES[signal], self._signal_index[signal])
+
+    def pick_category(self, category, session=None):
+        """Choose a line from a named category (e.g. 'generic' comebacks), or None"""
+        with self._lock:
+            self._watch.poll()
+            lines = self._categories.get(category)
+            return self._draw(session, category, lines) if lines else None
+
+    def _draw(self, session, category, lines):
+        """Deal from a per-session shuffled deck so lines do not repeat until all are used"""
+        key = (session, category)
+        deck = self._decks.pop(key, None)
+        if not deck:
+            deck = list(lines)
+            random.shuffle(deck)
+        line = deck.pop()
+        self._decks[key] = deck
+        while len(self._decks) > self.max_sessions:
+            self._decks.popitem(last=False)
+        return line
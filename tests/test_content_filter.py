@@ -0,0 +1,61 @@
+import pytest
+
+from content_filter import ContentFilter
+
+WORDS = ["darn", "heck", "gosh darn", "frick"]
+
+
+@pytest.fixture
+def content_filter(tmp_path):
+    path = tmp_path / 'banned_words.txt'
+    path.write_text("# test list\n" + "\n".join(WORDS) + "\n", encoding='utf-8')
+    return ContentFilter(path=path, replacement="interesting")
+
+
+def stream(content_filter, chunks):
+    filtered = content_filter.stream()
+    return "".join(filtered.feed(chunk) for chunk in chunks) + filtered.flush()
+
+
+def test_filter_replaces_whole_words_and_keeps_case(content_filter):
+    text = "Darn it, what the HECK is this darned frickin photo, heck."
+    assert content_filter.filter(text) == "Interesting it, what the INTERESTING is this darned frickin photo, interesting."
+
+
+def test_filter_prefers_the_longest_term(content_filter):
+    assert content_filter.filter("well gosh darn that") == "well interesting that"
+
+
+TEXTS = [
+    "You look darn tired, heck, gosh darn it!",
+    "heck",
+    "darned frickin frick... Darn",
+    "no banned words at all here",
+]
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_terms_split_across_any_chunk_boundary_are_replaced(content_filter, text):
+    expected = content_filter.filter(text)
+    for i in range(len(text) + 1):
+        for j in range(i, len(text) + 1):
+            assert stream(content_filter, [text[:i], text[i:j], text[j:]]) == expected, (i, j)
+
+
+@pytest.mark.parametrize('text', TEXTS)
+def test_single_character_chunks(content_filter, text):
+    assert stream(content_filter, list(text)) == content_filter.filter(text)
+
+
+def test_stream_emits_text_before_the_end(content_filter):
+    filtered = content_filter.stream()
+    out = filtered.feed("That photo is darn blurry and the lighting is ")
+    assert out.startswith("That photo is interesting blurry")
+    assert "darn" not in out
+
+
+def test_partial_term_is_held_back_not_emitted(content_filter):
+    filtered = content_filter.stream()
+    out = filtered.feed("what the he")
+    assert not out.endswith("he")
+    assert out + filtered.feed("ck") + filtered.flush() == "what the interesting"
@@ -0,0 +1,58 @@
+import pytest
+
+from intent_matcher import IntentMatcher
+
+
+@pytest.fixture
+def matcher():
+    return IntentMatcher.from_file()
+
+
+def intent(matcher, message):
+    found = matcher.classify(message)
+    return found['intent'] if found else None
+
+
+@pytest.mark.parametrize("message", ["this", "think so", "which one", "they said", "shirt"])
+def test_keywords_only_match_whole_words(matcher, message):
+    assert intent(matcher, message) is None
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("hi", "greeting"),
+    ("Hi there", "greeting"),
+    ("HEY!", "greeting"),
+    ("that was funny", "humor"),
+    ("you are so boring", "insult"),
+])
+def test_keywords_match_case_insensitively(matcher, message, expected):
+    assert intent(matcher, message) == expected
+
+
+def test_symbols_match_without_word_boundaries(matcher):
+    assert intent(matcher, "really?") == "question"
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("this is boring but funny", "humor"),
+    ("you're stupid, hi", "greeting"),
+    ("love it?", "question"),
+    ("rude and boring", "complaint"),
+])
+def test_earlier_intent_wins_regardless_of_position(matcher, message, expected):
+    assert intent(matcher, message) == expected
+
+
+def test_keyword_shared_by_two_intents_belongs_to_the_first():
+    matcher = IntentMatcher([
+        {'intent': 'first', 'keywords': ['Same'], 'response': 'one'},
+        {'intent': 'second', 'keywords': ['same', 'other'], 'response': 'two'},
+    ])
+    assert intent(matcher, "the same other") == 'first'
+    assert matcher.respond("other") == 'two'
+
+
+def test_no_intents_matches_nothing():
+    matcher = IntentMatcher([])
+    assert matcher.classify("hi?") is None
+    assert matcher.respond("hi?") is None
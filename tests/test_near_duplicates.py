@@ -0,0 +1,115 @@
+import json
+import random
+
+import pytest
+
+import json_response
+from near_duplicates import HASH_BITS, NearDuplicateIndex, is_degenerate, same_photo
+from photo_features import Colors, Composition, DominantColor, Faces, Objects, PhotoFeatures
+
+# A textured hash: half its bits set
+PHOTO = 0x0F0F_3C3C_A5A5_5A5A
+
+
+def flip(value, *bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def features(rgb=(120, 90, 60), aspect_ratio=4 / 3, hue_histogram=(0.5, 0.3, 0.2, 0.0)):
+    return PhotoFeatures(
+        faces=Faces(count=0, features=[]),
+        objects=Objects(glasses=False, multiple_people=False),
+        colors=Colors(
+            theme='mixed',
+            brightness=sum(rgb) / 3,
+            saturation=0.3,
+            contrast=0.2,
+            hue_histogram=list(hue_histogram),
+            dominant_colors=[DominantColor(rgb=list(rgb), share=1.0)]
+        ),
+        composition=Composition(aspect_ratio=aspect_ratio, resolution='high', orientation='landscape')
+    )
+
+
+def test_finds_hashes_within_max_distance():
+    index = NearDuplicateIndex(max_distance=4)
+    index.add(PHOTO, 'original')
+    assert index.find(PHOTO) == 'original'
+    assert index.find(flip(PHOTO, 0, 17, 33, 63)) == 'original'
+    assert index.find(flip(PHOTO, 0, 17, 33, 50, 63)) is None
+
+
+def test_returns_the_closest_match():
+    index = NearDuplicateIndex(max_distance=4)
+    index.add(flip(PHOTO, 1, 2, 3), 'far')
+    index.add(flip(PHOTO, 1), 'near')
+    assert index.find(PHOTO) == 'near'
+
+
+def test_zero_distance_only_matches_exactly():
+    index = NearDuplicateIndex(max_distance=0)
+    index.add(PHOTO, 'original')
+    assert index.find(PHOTO) == 'original'
+    assert index.find(flip(PHOTO, 5)) is None
+
+
+def test_matches_agree_with_a_linear_scan():
+    rng = random.Random(0)
+    index = NearDuplicateIndex(max_distance=4)
+    stored = {rng.getrandbits(HASH_BITS): f'photo {i}' for i in range(500)}
+    for value, key in stored.items():
+        index.add(value, key)
+    for value in list(stored)[:100]:
+        probe = flip(value, *rng.sample(range(HASH_BITS), rng.randint(0, 6)))
+        distances = {key: bin(probe ^ stored_value).count('1') for stored_value, key in stored.items()}
+        best = min(distances, key=distances.get)
+        expected = best if distances[best] <= 4 else None
+        assert index.find(probe) == expected
+
+
+def test_entries_are_bounded_least_recently_used_first():
+    index = NearDuplicateIndex(max_distance=0, max_entries=2)
+    a, b, c = PHOTO, flip(PHOTO, 10, 20, 30), flip(PHOTO, 40, 50, 60)
+    index.add(a, 'a')
+    index.add(b, 'b')
+    index.find(a)  # a is now the most recently used
+    index.add(c, 'c')
+    assert (index.find(a), index.find(b), index.find(c)) == ('a', None, 'c')
+    assert index.stats()['evictions'] == 1
+
+
+@pytest.mark.parametrize('value', [0, 1 << 7, (1 << HASH_BITS) - 1, flip((1 << HASH_BITS) - 1, 3, 9)])
+def test_degenerate_hashes_are_neither_stored_nor_matched(value):
+    index = NearDuplicateIndex(max_distance=4)
+    assert is_degenerate(value)
+    index.add(value, 'flat')
+    assert index.stats()['entries'] == 0
+    assert index.find(value) is None
+
+
+def test_textured_hashes_are_not_degenerate():
+    assert not is_degenerate(PHOTO)
+    assert not is_degenerate(0b1111)
+
+
+def test_same_photo_accepts_a_recompressed_copy():
+    original = features()
+    copy = features(rgb=(124, 87, 63), aspect_ratio=4 / 3 * 1.01, hue_histogram=(0.45, 0.33, 0.2, 0.02))
+    assert same_photo(copy, original)
+
+
+@pytest.mark.parametrize('other', [
+    features(rgb=(0, 0, 0)),  # Black after white, or any other brightness
+    features(rgb=(60, 90, 120)),  # Same brightness, different colour
+    features(aspect_ratio=1.0),  # Square thumbnail of a landscape photo
+    features(hue_histogram=(0.0, 0.2, 0.3, 0.5)),  # Same mean colour, different hues
+])
+def test_same_photo_rejects_what_the_hash_cannot_see(other):
+    assert not same_photo(other, features())
+
+
+def test_same_photo_accepts_cached_dicts():
+    original = json.loads(json_response.dumps(features()))
+    assert same_photo(features(), original)
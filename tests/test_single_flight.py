@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+import single_flight
+from single_flight import SingleFlight
+
+
+class Upstream:
+    """Counts calls; each call waits until released, then returns or raises"""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"result {self.calls}"
+
+
+def test_concurrent_identical_requests_share_one_call():
+    async def main():
+        flights = SingleFlight(ttl=0)
+        upstream = Upstream()
+        waiters = [asyncio.ensure_future(flights.run('key', upstream)) for _ in range(20)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        results = await asyncio.gather(*waiters)
+        return upstream.calls, results, flights.stats()
+
+    calls, results, stats = asyncio.run(main())
+    assert calls == 1
+    assert results == ["result 1"] * 20
+    assert (stats['calls'], stats['shared'], stats['in_flight']) == (1, 19, 0)
+
+
+def test_different_keys_do_not_share():
+    async def main():
+        flights = SingleFlight(ttl=0)
+        upstream = Upstream()
+        upstream.release.set()
+        return await asyncio.gather(flights.run('a', upstream), flights.run('b', upstream)), upstream.calls
+
+    results, calls = asyncio.run(main())
+    assert calls == 2
+    assert sorted(results) == ["result 1", "result 2"]
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def main():
+        flights = SingleFlight(ttl=60)
+        upstream = Upstream(error=TimeoutError("upstream timed out"))
+        waiters = [asyncio.ensure_future(flights.run('key', upstream)) for _ in range(5)]
+        await asyncio.sleep(0)
+        upstream.release.set()
+        outcomes = await asyncio.gather(*waiters, return_exceptions=True)
+
+        # The next request calls upstream again instead of replaying the failure
+        upstream.error = None
+        retry = await flights.run('key', upstream)
+        return outcomes, retry, upstream.calls, flights.stats()
+
+    outcomes, retry, calls, stats = asyncio.run(main())
+    assert all(isinstance(outcome, TimeoutError) for outcome in outcomes)
+    assert retry == "result 2"
+    assert calls == 2
+    assert stats['results'] == 1
+
+
+def test_one_waiter_cancelling_does_not_cancel_the_call():
+    async def main():
+        flights = SingleFlight(ttl=0)
+        upstream = Upstream()
+        leaving = asyncio.ensure_future(flights.run('key', upstream))
+        staying = asyncio.ensure_future(flights.run('key', upstream))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        upstream.release.set()
+        return await staying, leaving.cancelled()
+
+    assert asyncio.run(main()) == ("result 1", True)
+
+
+def test_results_are_reused_until_the_ttl_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(single_flight.time, 'monotonic', lambda: now[0])
+
+    async def main():
+        flights = SingleFlight(ttl=2.0)
+        upstream = Upstream()
+        upstream.release.set()
+        results = [await flights.run('key', upstream)]
+        now[0] += 1.9
+        results.append(await flights.run('key', upstream))
+        now[0] += 0.2
+        results.append(await flights.run('key', upstream))
+        return results, flights.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == ["result 1", "result 1", "result 2"]
+    assert (stats['calls'], stats['reused']) == (2, 1)
+
+
+def test_zero_ttl_keeps_no_results():
+    async def main():
+        flights = SingleFlight(ttl=0)
+        upstream = Upstream()
+        upstream.release.set()
+        return [await flights.run('key', upstream) for _ in range(2)], flights.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == ["result 1", "result 2"]
+    assert stats['results'] == 0
+
+
+@pytest.mark.parametrize('max_entries', [1, 3])
+def test_result_count_is_bounded(max_entries):
+    async def main():
+        flights = SingleFlight(ttl=60, max_entries=max_entries)
+        upstream = Upstream()
+        upstream.release.set()
+        for i in range(10):
+            await flights.run(f'key {i}', upstream)
+        return flights.stats()['results']
+
+    assert asyncio.run(main()) == max_entries
@@ -0,0 +1,29 @@
+import re
+
+
+def trie_pattern(words):
+    """Regex alternation for words, factored into a prefix trie.
+
+    A flat ``a|b|c|...`` makes the regex engine try every branch at every
+    position; the trie form only follows the branches that share the prefix
+    already read, so matching cost does not grow with the vocabulary.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        ends = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if ends:
+            # Prefer the longer keyword, but a shorter one may end here too
+            body = '(?:' + body + ')?'
+        return body
+
+    return build(trie)